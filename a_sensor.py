@@ -1,7 +1,7 @@
+import asyncio
 import tkinter as tk
 from tkinter import ttk
-import threading
-from bleak import BleakClient, BleakScanner
+from utils import transport
 from utils.edit_variant import BLEParameterEditor
 import matplotlib
 matplotlib.use("TkAgg")
@@ -9,26 +9,34 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from utils.ActionButtons import BLEActionButtons
-from utils.sensor_map import UUID_MAP,  PARAM_LABELS
+from utils.sensor_map import UUID_MAP,  PARAM_LABELS, WINDOW_TYPES
 from utils.plot_utils import update_plot_display
 from utils.ble_connect import connect_sensor, disconnect_sensor
 from utils.commit_utils import on_commit_button_click
 from utils.show_battery_temp import *
+from utils.param_reader import param_uuids
+from utils.param_transaction import ParamTransaction
+
+# Spectrum choices of the device window -> PlotRenderer.spectrum_mode
+SPECTRUM_MODES = {"FFT": "fft", "Welch linear": "linear", "Welch exponential": "exponential",
+                  "Welch peak hold": "peak"}
 
 
 class ASensorParameterApp:
-    def __init__(self, root, parent, address, name, sensor_connection, loop):
+    def __init__(self, root, parent, address, name, sensor_connection, dispatcher):
         self.sensor_connection = sensor_connection
         self.data_buffer = []
         self.root = root
-        self.loop = loop
+        self.dispatcher = dispatcher
+        self.loop = dispatcher.loop
         self.root.title(address + '(' + name + ')')
         self.parent = parent  # Reference to BLEDeviceScanner
-        self.client = sensor_connection.get_client()  # or passed explicitly
         self.address = address
         self.name = name
         self.param_raw_values = {}
         self.param_final_values = {}
+        # Edits are staged here and only written on SAVE
+        self.transaction = ParamTransaction(address, parent.param_cache, baseline=self.param_raw_values)
 
         self.editors = {}
 
@@ -38,8 +46,10 @@ class ASensorParameterApp:
         # Create editors but disable until connected
         for param_key in UUID_MAP.keys():
             label_text = PARAM_LABELS.get(param_key, param_key)
-            editor = BLEParameterEditor(self.main_frame, self.client, param_key, self.param_raw_values,
-                                        self.param_final_values, self.loop, label=label_text)
+            editor = BLEParameterEditor(self.main_frame, self.sensor_connection, param_key, self.param_raw_values,
+                                        self.param_final_values, self.dispatcher, label=label_text,
+                                        auto_read=False, param_cache=parent.param_cache,
+                                        transaction=self.transaction, registry=parent.registry)
             self.editors[param_key] = editor
 
         # print("Debug: final values: ", self.param_final_values)
@@ -62,14 +72,14 @@ class ASensorParameterApp:
         self.disconnect_btn.pack(side="left", padx=0)
 
         # Connection status
-        initial_status = "Connected" if self.client.is_connected else "Disconnected"
+        initial_status = "Connected" if self.sensor_connection.is_connected else "Disconnected"
         self.conn_status = tk.StringVar(value=initial_status)
         ttk.Label(conn_frame, textvariable=self.conn_status, foreground="blue").pack(side="left", padx=10)
 
         # Device actions in same line
         actions_frame = ttk.LabelFrame(conn_frame, text="Device Actions")
         actions_frame.pack(side="left", padx=0)
-        BLEActionButtons(actions_frame, self.client)
+        BLEActionButtons(actions_frame, self.sensor_connection, self.dispatcher, param_cache=parent.param_cache)
 
         # ---- TEMPERATURE & BATTERY ----
         sensor_frame = tk.Frame(self.main_frame)
@@ -82,6 +92,30 @@ class ASensorParameterApp:
         ttk.Label(sensor_frame, textvariable=self.temp_var).grid(row=0, column=0, padx=5, sticky="w")
         ttk.Label(sensor_frame, textvariable=self.battery_var).grid(row=0, column=1, padx=5, sticky="w")
         ttk.Label(sensor_frame, textvariable=self.time_var).grid(row=0, column=2, padx=5, sticky="w")
+        self.trace_var = tk.StringVar(value="Trace: waiting for data")
+        ttk.Label(sensor_frame, textvariable=self.trace_var).grid(row=1, column=0, columnspan=3, padx=5, sticky="w")
+
+        # ---- SPECTRUM OPTIONS ----
+        plot_options = ttk.Frame(self.main_frame)
+        plot_options.pack(fill="x", padx=10)
+        ttk.Label(plot_options, text="Window").pack(side="left")
+        self.window_var = tk.StringVar(value=WINDOW_TYPES[0])
+        window_box = ttk.Combobox(plot_options, textvariable=self.window_var, values=WINDOW_TYPES,
+                                  state="readonly", width=16)
+        window_box.pack(side="left", padx=5)
+        window_box.bind("<<ComboboxSelected>>", self.on_plot_options)
+        ttk.Label(plot_options, text="FFT size").pack(side="left", padx=(15, 0))
+        self.fft_size_var = tk.StringVar(value="Trace length")
+        self.fft_size_box = ttk.Combobox(plot_options, textvariable=self.fft_size_var, state="readonly", width=10,
+                                         postcommand=self.refresh_fft_sizes)
+        self.fft_size_box.pack(side="left", padx=5)
+        self.fft_size_box.bind("<<ComboboxSelected>>", self.on_plot_options)
+        ttk.Label(plot_options, text="Spectrum").pack(side="left", padx=(15, 0))
+        self.spectrum_mode_var = tk.StringVar(value=next(iter(SPECTRUM_MODES)))
+        mode_box = ttk.Combobox(plot_options, textvariable=self.spectrum_mode_var, values=list(SPECTRUM_MODES),
+                                state="readonly", width=18)
+        mode_box.pack(side="left", padx=5)
+        mode_box.bind("<<ComboboxSelected>>", self.on_plot_options)
 
         # ---- PLOTS ----
         fig = Figure(figsize=(12, 9))
@@ -96,43 +130,151 @@ class ASensorParameterApp:
         self.canvas.get_tk_widget().pack(fill="both", expand=True, pady=10, padx=10)
 
         # Start periodic updates
-        self.root.after(1000, lambda: update_temp_time(self))
-        self.root.after(200, lambda: update_plot_display(info=self.parent.device_map[address],
-                                                         canvas=self.canvas,
-                                                         ax_acc_time=self.ax_acc_time,
-                                                         ax_vel_time=self.ax_vel_time,
-                                                         ax_acc_freq=self.ax_acc_freq,
-                                                         ax_vel_freq=self.ax_vel_freq
-                                                         ))
+        # The batch read in enable_editors() fills the first temperature/battery values
+        self.root.after(200000, lambda: update_temp_time(self))
+        self.plot_renderer = None  # PlotRenderer: persistent lines, blitted every 200 ms
+        self.root.after(200, self.start_plots)
+        self.root.after(500, self.update_trace_status)
         sensor_frame.pack(fill="x", pady=10)
 
         self.enable_editors()
 
+    @property
+    def client(self):
+        """The sensor's current client, looked up per call: a reconnect replaces it."""
+        return self.sensor_connection.get_client()
+
+    def start_plots(self):
+        self.plot_renderer = update_plot_display(info=self.parent.device_map[self.address],
+                                                 canvas=self.canvas,
+                                                 ax_acc_time=self.ax_acc_time,
+                                                 ax_vel_time=self.ax_vel_time,
+                                                 ax_acc_freq=self.ax_acc_freq,
+                                                 ax_vel_freq=self.ax_vel_freq,
+                                                 spectral_worker=self.parent.spectral_worker)
+
+    def update_trace_status(self):
+        """Download progress and throughput of the trace being assembled, every 500 ms."""
+        if not self.root.winfo_exists():
+            return
+        traces = self.parent.device_map[self.address].get("traces")
+        if traces is not None:
+            self.trace_var.set(traces.status())
+        self.root.after(500, self.update_trace_status)
+
+    def refresh_fft_sizes(self):
+        # Offered sizes follow the sensor's trace length, which can change on SAVE
+        if self.plot_renderer:
+            info = self.parent.device_map[self.address]
+            self.fft_size_box["values"] = ["Trace length"] + self.plot_renderer.fft_sizes(info)
+
+    def on_plot_options(self, event=None):
+        if self.plot_renderer:
+            size = self.fft_size_var.get()
+            self.plot_renderer.n_fft = int(size) if size.isdigit() else None  # None: the trace length
+            self.plot_renderer.configure(window_name=self.window_var.get(),
+                                         spectrum_mode=SPECTRUM_MODES[self.spectrum_mode_var.get()])
+
     def enable_editors(self):
         for editor in self.editors.values():
             editor.widget["state"] = "normal"
             editor.status.set("Connected")
-            threading.Thread(target=editor.read_value, daemon=True).start()
+        self.read_all_parameters()
+
+    def read_all_parameters(self, fresh=False):
+        """Fill all editors from the parameter cache, reading whatever is stale in one batch."""
+        keys = [key for group in param_uuids().values() for key in group]
+        future = self.dispatcher.submit(self.parent.param_cache.get_or_read(
+            self.sensor_connection.get_client(), self.address, keys, fresh=fresh))
+        future.add_done_callback(lambda fut: self.root.after(0, lambda: self._show_parameters(fut)))
+        return future
+
+    def _show_parameters(self, future):
+        try:
+            values = future.result()
+        except Exception as e:
+            print(f"Batch read failed for {self.address}:", e)
+            for editor in self.editors.values():
+                editor.status.set("Read failed")
+            return
+        self.show_parameters(values)
+
+    def show_parameters(self, values):
+        """Fill editors and sensor labels from a {key: (raw, label)} batch result. Tk thread only."""
+        for param_key, editor in self.editors.items():
+            result = values.get(param_key)
+            if isinstance(result, tuple):
+                editor.apply_value(*result)
+            else:
+                editor.status.set("Read failed")
+
+        def raw(key):
+            result = values.get(key)
+            return result[0] if isinstance(result, tuple) else None
+
+        set_sensor_readings(self.temp_var, self.battery_var, self.time_var,
+                            raw("temp"), raw("battery"), raw("time"))
+        self.parent.registry.remember(self.address, calibration=raw("calibration"),
+                                      params={key: raw(key) for key in UUID_MAP if raw(key) is not None})
 
 
 class SensorConnection:
-    def __init__(self, address):
+    """Owns the BleakClient for one sensor.
+
+    In session mode (``start_session``) the link is kept up: ``on_connected`` runs once
+    per established link (e.g. to subscribe), and the connection is only rebuilt when
+    bleak reports a disconnect. Bring-ups (``start_session``, ``reconnect`` and the
+    background reconnect) hold a lock, so two of them never build links side by side.
+    ``before_disconnect`` runs at the start of ``disconnect()``, while the link is still
+    up (e.g. to write out recorders).
+    """
+
+    def __init__(self, address, reconnect_delay=2.0, max_reconnect_delay=30.0, registry=None, before_disconnect=None):
         self.address = address
-        self.client: BleakClient | None = None
+        self.registry = registry  # DeviceRegistry: direct connect from the last known handle
+        self.client = None  # transport.BleakClient
+        self.on_connected = None
+        self.before_disconnect = before_disconnect  # coroutine function, called with this connection
+        self.keep_alive = False
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._loop = None
+        self._reconnect_task = None
+        self._closing = False  # set while we tear the link down ourselves
+        self._lock = asyncio.Lock()  # one bring-up at a time
 
     async def connect(self):
+        """Connect if not already connected; an established link is left untouched."""
+        if self.is_connected:
+            return
         try:
-            if self.client and getattr(self.client, "is_connected", False):
-                await self.client.disconnect()
-            self.client = BleakClient(self.address)
-            await self.client.connect()
+            if self.registry:
+                self.client = await self.registry.connect(self.address, disconnected_callback=self._on_disconnect)
+            else:
+                self.client = transport.BleakClient(self.address, disconnected_callback=self._on_disconnect)
+                await self.client.connect()
             print(f"Connected to {self.address}")
         except Exception as e:
             print(f"Failed to connect {self.address}: {e}")
 
     async def disconnect(self):
+        self.keep_alive = False
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.before_disconnect:
+            try:
+                await self.before_disconnect(self)
+            except Exception as e:
+                print(f"Before disconnecting {self.address}: {e}")
+        await self._close_client()
+
+    async def _close_client(self):
         if self.client and getattr(self.client, "is_connected", False):
-            await self.client.disconnect()
+            self._closing = True
+            try:
+                await self.client.disconnect()
+            finally:
+                self._closing = False
 
     def get_client(self):
         return self.client
@@ -142,16 +284,81 @@ class SensorConnection:
         return self.client.is_connected if self.client else False
 
     async def reconnect(self):
-        try:
-            if self.client and getattr(self.client, "is_connected", False):
-                await self.client.disconnect()
-            if self.client and self.client.is_connected:
-                await self.client.disconnect()
-            self.client = BleakClient(self.address)
-            await self.client.connect()
-            print(f"Reconnected to {self.address}")
+        """Force a fresh link (e.g. after a commit) and re-run the session setup; retried in the background on failure."""
+        # The commit's disconnect may already have started the background loop: this replaces it
+        task = self._reconnect_task
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        async with self._lock:
+            try:
+                await self._close_client()
+                self.client = None
+                await self.connect()
+                if self.is_connected:
+                    await self._run_on_connected()
+                    print(f"Reconnected to {self.address}")
+                    return
+            except Exception as e:
+                print(f"Failed to reconnect {self.address}: {e}")
+                await self._close_client()
+        if self.keep_alive and self._loop:
+            self._schedule_reconnect()
 
-        except Exception as e:
-            print(f"Failed to reconnect {self.address}: {e}")
+    # ---- session mode ----
+    async def start_session(self, on_connected=None):
+        """Connect once and keep the link up until ``disconnect()`` is called.
+
+        If the session setup fails the link is closed and the error raised, so the
+        caller (the orchestrator) sees a failed bring-up.
+        """
+        if on_connected is not None:
+            self.on_connected = on_connected
+        self._loop = asyncio.get_running_loop()
+        self.keep_alive = True
+        async with self._lock:
+            await self.connect()
+            if self.is_connected:
+                try:
+                    await self._run_on_connected()
+                except Exception:
+                    await self.disconnect()
+                    raise
+                return
+        self._schedule_reconnect()
+
+    async def _run_on_connected(self):
+        if self.on_connected:
+            await self.on_connected(self)
+
+    def _on_disconnect(self, client):
+        # bleak may call this from its own thread; hop onto the session loop
+        if self._closing or client is not self.client:
+            return
+        print(f"{self.address} disconnected")
+        if self.keep_alive and self._loop:
+            self._loop.call_soon_threadsafe(self._schedule_reconnect)
 
+    def _schedule_reconnect(self):
+        if self._reconnect_task and not self._reconnect_task.done():
+            return
+        self._reconnect_task = self._loop.create_task(self._reconnect_loop())
 
+    async def _reconnect_loop(self):
+        # Retried until the link and the session setup both succeed
+        delay = self.reconnect_delay
+        while self.keep_alive and not self.is_connected:
+            await asyncio.sleep(delay)
+            async with self._lock:
+                if self.is_connected:
+                    return  # brought up meanwhile (reconnect) with its own session setup
+                await self.connect()
+                if self.is_connected:
+                    try:
+                        await self._run_on_connected()
+                    except Exception as e:
+                        print(f"Session setup failed for {self.address}: {e}")
+                        await self._close_client()
+                    else:
+                        print(f"Session restored for {self.address}")
+                        return
+            delay = min(delay * 2, self.max_reconnect_delay)
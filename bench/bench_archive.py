@@ -0,0 +1,80 @@
+# Archive size and time-range query speed vs a flat .bvcap capture of the same simulated stream
+# plus the lower-precision tiers (low bits rounded away), which are what makes weeks of noisy data fit.
+# The archive query costs the same whatever the archive length; the capture scan grows with it
+# run from the repo root: python -m bench.bench_archive [minutes] [codec]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.archive import Archive, ArchiveWriter
+from utils.capture import CaptureReader, CaptureWriter
+from utils.sim_backend import SimSensor, VALUES_PER_PACKET
+
+TIERS = (0, 4, 6)  # drop_bits: lossless, then steps of 16 and 64 counts
+
+
+def main(minutes, codec):
+    sensor = SimSensor("5E:00:00:00:00:01")
+    calibration = sensor.registers["calibration"]
+    value_rate = sensor.sample_rate * sensor.axes
+    packets = int(minutes * 60 * value_rate / VALUES_PER_PACKET)
+    directory = tempfile.mkdtemp()
+    capture_file = os.path.join(directory, "stream.bvcap")
+
+    t_start = 1_700_000_000.0
+    capture = CaptureWriter(capture_file, sensor.address, calibration, sample_rate=sensor.sample_rate, axes=sensor.axes)
+    archives = {bits: ArchiveWriter(os.path.join(directory, f"bits{bits}"), sensor.address, calibration,
+                                    sample_rate=sensor.sample_rate, axes=sensor.axes, codec=codec, drop_bits=bits)
+                for bits in TIERS}
+    start = time.perf_counter()
+    sent = 0
+    while sent < packets:
+        batch = sensor.next_packets(min(1024, packets - sent))
+        for payload in batch:
+            timestamp = t_start + sent * VALUES_PER_PACKET / value_rate
+            capture.record(payload, timestamp)
+            raw = np.frombuffer(payload, dtype="<u2")
+            for archive in archives.values():
+                archive.append(raw, timestamp)
+            sent += 1
+    capture.close()
+    for archive in archives.values():
+        archive.close()
+    print(f"wrote {minutes} min ({packets} notifications) in {time.perf_counter() - start:.1f}s")
+
+    capture_bytes = os.path.getsize(capture_file)
+    print(f"capture {capture_bytes / 1e6:8.1f} MB")
+    for bits, archive in archives.items():
+        size = sum(os.path.getsize(os.path.join(archive.directory, f)) for f in os.listdir(archive.directory))
+        print(f"archive {size / 1e6:8.1f} MB ({codec}, drop_bits {bits}: {capture_bytes / size:.1f}x smaller)")
+
+    # "Show me 5 seconds in the middle": scan the flat capture vs indexed archive query
+    t0 = t_start + minutes * 30
+    t1 = t0 + 5
+    start = time.perf_counter()
+    reader = CaptureReader(capture_file)
+    mask = (reader.timestamps >= t0) & (reader.timestamps < t1)
+    flat = reader.raw_samples()[mask].ravel()
+    flat_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = Archive(os.path.join(directory, "bits0")).read_range(sensor.address, t0, t1, calibrated=False)
+    archive_time = time.perf_counter() - start
+    print(f"5 s query: capture scan {flat_time * 1e3:.1f} ms, archive {archive_time * 1e3:.1f} ms, "
+          f"{result.samples.size} samples (capture {flat.size})")
+    # Both cut on whole packets / frames, so compare the overlap
+    n = min(flat.size, result.samples.size)
+    offset = np.searchsorted(result.times, reader.timestamps[mask][0]) if n else 0
+    assert np.array_equal(result.samples[offset:offset + n], flat[:n]), "archive does not round-trip"
+    for bits in TIERS[1:]:
+        coarse = Archive(os.path.join(directory, f"bits{bits}")).read_range(sensor.address, t0, t1, calibrated=False)
+        error = np.abs(coarse.samples[offset:offset + n].astype(np.int32) - flat[:n]).max()
+        assert error <= 1 << (bits - 1), f"drop_bits {bits}: error {error} counts"
+        print(f"drop_bits {bits}: at most {error} counts off")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10, sys.argv[2] if len(sys.argv) > 2 else "zlib")
@@ -0,0 +1,46 @@
+# Micro-benchmark: list-comprehension decode vs numpy arithmetic vs the Decoder lookup table,
+# and the per-axis means of the handler for 1 vs 3 axes
+# run from the repo root: python -m bench.bench_decoder
+import os
+import struct
+import timeit
+
+import numpy as np
+
+from utils.decoder import SAMPLE_DTYPE, ZERO_G_OFFSET, Decoder, conversion_factor, deinterleave
+
+CALIBRATION = 7813
+PAYLOAD = os.urandom(128)  # 64 samples, the size seen in log/40_connect.log
+NUMBER = 20000
+
+
+def decode_list(data, factor):
+    samples = struct.unpack('<' + 'H' * (len(data) // 2), data)
+    return [round((sample - 32768) * factor, 2) for sample in samples]
+
+
+def decode_arithmetic(data, factor):
+    # The previous per-packet path: factor recomputed by the caller, three passes, a new array
+    values = np.frombuffer(data, dtype=SAMPLE_DTYPE, count=len(data) // 2).astype(np.float32)
+    values -= ZERO_G_OFFSET
+    values *= np.float32(factor)
+    return values
+
+
+def main():
+    decoder = Decoder(CALIBRATION)
+    out = np.empty(64, dtype=np.float32)
+    for name, fn in (("list comprehension", lambda: decode_list(PAYLOAD, conversion_factor(CALIBRATION))),
+                     ("numpy arithmetic", lambda: decode_arithmetic(PAYLOAD, conversion_factor(CALIBRATION))),
+                     ("Decoder.decode", lambda: decoder.decode(PAYLOAD)),
+                     ("Decoder.decode_into", lambda: decoder.decode_into(PAYLOAD, out))):
+        best = min(timeit.repeat(fn, number=NUMBER, repeat=5))
+        print(f"{name:>22}: {best / NUMBER * 1e6:7.2f} us per notification")
+    for axes in (1, 3):
+        best = min(timeit.repeat(lambda: deinterleave(decoder.decode_into(PAYLOAD, out), 64, axes).mean(axis=0),
+                                 number=NUMBER, repeat=5))
+        print(f"{f'decode + {axes}-axis means':>22}: {best / NUMBER * 1e6:7.2f} us per notification")
+
+
+if __name__ == "__main__":
+    main()
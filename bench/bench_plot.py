@@ -0,0 +1,88 @@
+# Frame time of the device-window plots: clear-and-replot (old update_plot_display) vs PlotRenderer
+# run from the repo root: python -m bench.bench_plot
+# Uses the Agg canvas, so it measures drawing only (no Tk blit to the screen).
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from utils.decoder import Decoder, deinterleave
+from utils.plot_utils import PlotRenderer
+from utils.ring_buffer import SensorRingBuffer
+from utils.sim_backend import SimSensor
+
+FRAMES = 30
+
+
+def make_axes():
+    fig = Figure(figsize=(12, 9))
+    canvas = FigureCanvasAgg(fig)
+    axes = [fig.add_subplot(n) for n in (221, 223, 222, 224)]  # acc time, vel time, acc freq, vel freq
+    fig.tight_layout(pad=7.0)
+    return canvas, axes
+
+
+def spectrum(data, time_data):
+    # The old per-notification FFT over arrival times
+    dt_arr = np.diff(time_data)
+    dt = np.mean(dt_arr[dt_arr > 0]) if np.any(dt_arr > 0) else 1e-6
+    return np.fft.rfftfreq(len(data), d=dt), np.abs(np.fft.rfft(data))
+
+
+def replot(canvas, axes, info, max_points=200):
+    plot_data = info["buffer"].latest(max_points)
+    # The old handler kept one mean over all axes per notification
+    plot_data = plot_data._replace(acc_mean=plot_data.acc_mean.mean(axis=1),
+                                   velocity=plot_data.velocity.mean(axis=1))
+    for ax, data, title in ((axes[0], plot_data.acc_mean, "Acceleration vs Time"),
+                            (axes[1], plot_data.velocity, "Velocity vs Time")):
+        ax.clear()
+        ax.plot(plot_data.timestamps, data, label=title)
+        ax.set_title(title)
+        ax.set_xlabel("Time (s)")
+        ax.legend()
+    for ax, data in ((axes[2], plot_data.acc_mean), (axes[3], plot_data.velocity)):
+        ax.clear()
+        freqs, fft_vals = spectrum(data, plot_data.timestamps)
+        ax.plot(freqs, fft_vals)
+        ax.set_title("Spectrum")
+    canvas.draw()
+
+
+def feed(buffer, sensor, count=20):
+    decoder = Decoder.from_params(sensor.registers)
+    axes = sensor.registers["axes"]
+    for payload in sensor.next_packets(count):
+        samples = decoder.decode(payload)
+        acc = deinterleave(samples, buffer.total * len(samples), axes).mean(axis=0)
+        t = buffer.last_timestamp + 0.0025 if len(buffer) else 0.0
+        buffer.append(t, acc, (buffer.last_velocity if len(buffer) else 0.0) + acc * 0.0025, samples)
+
+
+def main():
+    sensor = SimSensor("5E:00:00:00:00:01")
+    info = {"buffer": SensorRingBuffer(), "stream": dict(sensor.registers)}
+    feed(info["buffer"], sensor, 400)
+
+    canvas, axes = make_axes()
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        feed(info["buffer"], sensor)
+        replot(canvas, axes, info)
+    old = (time.perf_counter() - start) / FRAMES * 1e3
+
+    print(f"clear + replot: {old:6.1f} ms/frame")
+    for mode in ("fft", "linear"):
+        canvas, axes = make_axes()
+        renderer = PlotRenderer(canvas, *axes, spectrum_mode=mode)
+        frames = []
+        for _ in range(FRAMES):
+            feed(info["buffer"], sensor)
+            renderer.update(info)
+            frames.append(renderer.frame_ms)
+        print(f"PlotRenderer ({mode}): {np.mean(frames):6.1f} ms/frame ({renderer.redraws} full redraws "
+              f"in {FRAMES} frames, median {np.median(frames):.1f} ms)")
+
+if __name__ == "__main__":
+    main()
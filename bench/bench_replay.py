@@ -0,0 +1,53 @@
+# Replay recorded logs through the notification handler as fast as possible
+# run from the repo root: python -m bench.bench_replay [repeats] log/40_Aug7.log ...
+import asyncio
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ["BLUVIB_BACKEND"] = "replay"
+os.environ.setdefault("BLUVIB_REPLAY_SPEED", "max")
+
+from utils import transport
+from utils.replay_backend import load_recordings
+from utils.plot_utils import start_acceleration_stream_Scanner
+from utils.ring_buffer import SensorRingBuffer
+
+
+async def run(paths, repeats):
+    sensors = load_recordings(paths)
+    for sensor in sensors:
+        sensor.payloads = sensor.payloads * repeats
+    loop = asyncio.get_running_loop()
+    clients, infos = [], []
+    for sensor in sensors:
+        client = transport.BleakClient(sensor.address)
+        await client.connect()
+        info = {"address": sensor.address, "count_notify": 0, "buffer": SensorRingBuffer(),
+                "stream": dict(sensor.registers)}
+        start_acceleration_stream_Scanner(client, info, loop, sensor.registers["calibration"], verbose=False)
+        clients.append(client)
+        infos.append(info)
+
+    start = time.perf_counter()
+    while not all(c.finished is not None and c.finished.is_set() for c in clients):
+        await asyncio.sleep(0.01)
+    handler_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for info in infos:
+        np.abs(np.fft.rfft(info["buffer"].latest().samples.ravel()))
+    fft_time = time.perf_counter() - start
+
+    total = sum(info["count_notify"] for info in infos)
+    print(f"{total} notifications in {handler_time:.2f}s ({total / handler_time:.0f}/s), "
+          f"FFT over buffers {fft_time * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    paths = sys.argv[2:] or sorted(glob.glob("log/*.log"))
+    asyncio.run(run(paths, repeats))
@@ -0,0 +1,39 @@
+# End-to-end streaming benchmark against the simulated backend (no radio needed)
+# run from the repo root: python -m bench.bench_sim_stream [sensors] [seconds]
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("BLUVIB_BACKEND", "sim")
+
+from utils import sim_backend, transport
+from utils.plot_utils import start_acceleration_stream_Scanner
+from utils.ring_buffer import SensorRingBuffer
+
+
+async def run(sensors, seconds):
+    sim_backend.populate(sensors)
+    loop = asyncio.get_running_loop()
+    infos = []
+    for address, sensor in sim_backend.SIM_SENSORS.items():
+        client = transport.BleakClient(address)
+        await client.connect()
+        info = {"address": address, "count_notify": 0, "buffer": SensorRingBuffer(),
+                "stream": dict(sensor.registers)}
+        start_acceleration_stream_Scanner(client, info, loop, sensor.registers["calibration"], verbose=False)
+        infos.append(info)
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    total = sum(info["count_notify"] for info in infos)
+    print(f"{len(infos)} sensors, {wall:.1f}s: {total} notifications ({total / wall:.0f}/s), "
+          f"CPU {cpu / wall * 100:.0f}% of one core, {cpu / max(total, 1) * 1e6:.1f} us per notification")
+
+
+if __name__ == "__main__":
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    asyncio.run(run(sensors, seconds))
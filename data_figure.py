@@ -1,9 +1,9 @@
-import struct
-
-from utils.sensor_map import UUID_DATA
+from utils.sensor_map import UUID_DATA, UUID_MAP
+from utils.decoder import Decoder
 
 data_uuid, data_size = UUID_DATA["data"]
 calb_uuid, calb_size = UUID_DATA["calibration"]
+gain_uuid, gain_size = UUID_MAP["gain"]
 
 
 def update_plot(self, g_values):
@@ -16,26 +16,18 @@ def update_plot(self, g_values):
     self.canvas.draw()
 
 
-def parse_data_packet(raw_bytes, scale_factor=1.0):
-    # Expecting exactly 16 bytes → 8 samples
-    samples = struct.unpack("<8H", raw_bytes)  # unsigned short, little endian
-    # Convert to signed range and scale to g
-    g_values = [ (s - 0x8000) * scale_factor for s in samples ]
-    return g_values
-
-
-async def read_scale_factor(self):
-    raw_bytes = await self.client.read_gatt_char(calb_uuid)
-    # Example: single float, little endian
-    scale_factor, = struct.unpack("<f", raw_bytes)
-    return scale_factor
+async def read_decoder(self):
+    # Calibration and gain registers: unsigned little-endian integers
+    calibration = int.from_bytes(await self.client.read_gatt_char(calb_uuid), "little")
+    gain = int.from_bytes(await self.client.read_gatt_char(gain_uuid), "little")
+    return Decoder.from_params({"calibration": calibration, "gain": gain})
 
 
 async def start_stream(self):
-    self.scale_factor = await self.read_scale_factor()
+    self.decoder = await self.read_decoder()
     await self.client.start_notify(data_uuid, self.notification_handler)
 
 def notification_handler(self, sender, data):
-    g_values = parse_data_packet(data, self.scale_factor)
+    g_values = self.decoder.decode(data)
     # Update your plot with the new g_values
     self.update_plot(g_values)
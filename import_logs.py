@@ -0,0 +1,98 @@
+"""Import legacy console dumps (log/*.log from old/connect.py, old/keep_connect.py) into the sample archive.
+
+    python import_logs.py log/                       # every *.log below log/
+    python import_logs.py --archive archive --axes 3 --start 2025-08-07T14:00 log/40_Aug7.log
+
+The dumps carry no timestamps: samples are laid out at the nominal sample rate from
+--start (default: the file's modification time). Query the result with
+utils.archive.Archive(...).read_range(address, t0, t1).
+"""
+import argparse
+import glob
+import os
+import time
+from datetime import datetime
+
+from utils.archive import ArchiveWriter, CODECS
+from utils.log_parser import iter_log_batches, new_header
+
+
+def log_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "**", "*.log"), recursive=True))
+        else:
+            yield path
+
+
+def import_file(path, args):
+    """Stream one dump into the archive; returns (lines, notifications, segments)."""
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else os.path.getmtime(path)
+    header = new_header()
+    lines = 0
+    notifications = 0
+    segments = 0
+    writer = None
+    settings = None
+    timestamp = start
+
+    def counted(f):
+        nonlocal lines
+        for lines, line in enumerate(f, 1):
+            yield line
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for header, raw, sizes in iter_log_batches(counted(f), header):
+            current = (header["address"], header["calibration"], header["gain"])
+            if writer is None or current != settings:
+                # New sensor or new settings further down the file: start a new segment
+                if writer:
+                    writer.close()
+                settings = current
+                address = header["address"] or args.address
+                writer = ArchiveWriter(args.archive, address, header["calibration"] or args.calibration,
+                                       gain=header["gain"] or 1,
+                                       sample_rate=header["sample_rate"] or args.sample_rate,
+                                       axes=args.axes, codec=args.codec, start=timestamp,
+                                       drop_bits=args.drop_bits)
+                segments += 1
+            writer.append(raw, timestamp)
+            timestamp += raw.size / (writer.sample_rate * writer.axes)
+            notifications += len(sizes)
+    if writer:
+        writer.close()
+    return lines, notifications, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="log files or directories")
+    parser.add_argument("--archive", default="archive", help="archive root (default: archive)")
+    parser.add_argument("--codec", default="zlib", choices=sorted(CODECS))
+    parser.add_argument("--drop-bits", type=int, default=0, help="low bits to round away (default 0: lossless)")
+    parser.add_argument("--axes", type=int, default=1, help="axes the sensor streamed (not in the dumps)")
+    parser.add_argument("--sample-rate", type=int, default=25600, help="Hz, when the dump does not say")
+    parser.add_argument("--calibration", type=int, default=7813, help="when the dump does not say")
+    parser.add_argument("--address", default="00:00:00:00:00:00", help="when the dump does not say")
+    parser.add_argument("--start", help="ISO time of the first sample (default: file modification time)")
+    args = parser.parse_args()
+
+    total_lines = total_notifications = total_bytes = 0
+    began = time.perf_counter()
+    for path in log_files(args.paths):
+        t = time.perf_counter()
+        lines, notifications, segments = import_file(path, args)
+        elapsed = time.perf_counter() - t
+        total_lines += lines
+        total_notifications += notifications
+        total_bytes += os.path.getsize(path)
+        print(f"{path}: {lines} lines, {notifications} notifications, {segments} segment(s), "
+              f"{lines / max(elapsed, 1e-9):,.0f} lines/s")
+    elapsed = time.perf_counter() - began
+    print(f"Total: {total_lines} lines ({total_bytes / 1e6:.1f} MB), {total_notifications} notifications "
+          f"in {elapsed:.2f}s, {total_lines / max(elapsed, 1e-9):,.0f} lines/s, "
+          f"{total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,16 @@
-import asyncio
-import threading
 import tkinter as tk
 from tkinter import ttk
-from bleak import BleakScanner, BleakClient
+from utils import transport
 from utils.sensor_map import UUID_MAP, MAPPINGS  # You already have these
+from utils.gatt_dispatcher import GattDispatcher
 
 
 # ---------- Parameter Editor for One Device ----------
 class MultiParamEditor:
-    def __init__(self, root, address):
+    def __init__(self, root, address, dispatcher):
         self.root = root
         self.address = address
+        self.dispatcher = dispatcher
         self.root.title(f"Edit Parameters - {address}")
         self.client = None
 
@@ -43,45 +43,46 @@ class MultiParamEditor:
             widget.grid(row=row, column=1, padx=5)
             self.param_widgets[param_key] = (widget, mapping)
 
-        # Start BLE connection in a thread
-        threading.Thread(target=self.connect_and_read_all, daemon=True).start()
+        # Connect on the GATT loop
+        self.dispatcher.submit(self.connect_and_read_all())
 
-    def connect_and_read_all(self):
+    async def connect_and_read_all(self):
         try:
-            self.client = BleakClient(self.address)
-            asyncio.run(self.client.connect())
+            self.client = transport.BleakClient(self.address)
+            await self.client.connect()
             if self.client.is_connected:
-                self.status.set("Connected")
+                self.root.after(0, lambda: self.status.set("Connected"))
                 for param_key in UUID_MAP.keys():
-                    self.read_value(param_key)
+                    await self.read_value(param_key)
             else:
-                self.status.set("Connection failed.")
+                self.root.after(0, lambda: self.status.set("Connection failed."))
         except Exception as e:
-            self.status.set(f"Error: {e}")
+            self.root.after(0, lambda e=e: self.status.set(f"Error: {e}"))
             print("Connection failed:", e)
 
-    def read_value(self, param_key):
+    async def read_value(self, param_key):
         try:
-            uuid = UUID_MAP[param_key]
+            uuid, _ = UUID_MAP[param_key]
             mapping = MAPPINGS.get(param_key, None)
-            value_bytes = asyncio.run(self.client.read_gatt_char(uuid))
+            value_bytes = await self.client.read_gatt_char(uuid)
             raw_val = int.from_bytes(value_bytes, byteorder="little")
-
-            if mapping:
-                value_dict = dict(mapping)
-                label = value_dict.get(raw_val, f"Unknown ({raw_val})")
-                self.values[param_key].set(label)
-                self.param_widgets[param_key][0]["state"] = "readonly"
-            else:
-                self.values[param_key].set(str(raw_val))
-                self.param_widgets[param_key][0]["state"] = "normal"
-
+            self.root.after(0, lambda: self.show_value(param_key, mapping, raw_val))
         except Exception as e:
             print(f"Failed to read {param_key}:", e)
 
+    def show_value(self, param_key, mapping, raw_val):
+        if mapping:
+            value_dict = dict(mapping)
+            label = value_dict.get(raw_val, f"Unknown ({raw_val})")
+            self.values[param_key].set(label)
+            self.param_widgets[param_key][0]["state"] = "readonly"
+        else:
+            self.values[param_key].set(str(raw_val))
+            self.param_widgets[param_key][0]["state"] = "normal"
+
     def write_value(self, param_key):
         try:
-            uuid = UUID_MAP[param_key]
+            uuid, _ = UUID_MAP[param_key]
             mapping = MAPPINGS.get(param_key, None)
             val_str = self.values[param_key].get()
 
@@ -98,19 +99,28 @@ class MultiParamEditor:
                 else:
                     raise ValueError("Value too large")
 
-            asyncio.run(self.client.write_gatt_char(uuid, data))
-            self.status.set(f"Wrote {val_str} to {param_key}")
-            print(f"Wrote {raw_val} ({val_str}) to {param_key}")
-
         except Exception as e:
             print(f"Failed to write {param_key}:", e)
             self.status.set("Write failed")
+            return
+
+        def on_done(future):
+            try:
+                future.result()
+                self.root.after(0, lambda: self.status.set(f"Wrote {val_str} to {param_key}"))
+                print(f"Wrote {raw_val} ({val_str}) to {param_key}")
+            except Exception as e:
+                print(f"Failed to write {param_key}:", e)
+                self.root.after(0, lambda: self.status.set("Write failed"))
+
+        self.dispatcher.write(self.client, uuid, data).add_done_callback(on_done)
 
 
 # ---------- Scanner Window ----------
 class BLEScannerApp:
-    def __init__(self, root):
+    def __init__(self, root, dispatcher):
         self.root = root
+        self.dispatcher = dispatcher
         self.root.title("BLE Device Scanner")
 
         self.tree = ttk.Treeview(root, columns=("Address", "RSSI"), show="headings")
@@ -124,10 +134,10 @@ class BLEScannerApp:
         self.tree.bind("<Double-1>", self.open_editor)
 
     def start_scan(self):
-        threading.Thread(target=self.scan_devices, daemon=True).start()
+        future = self.dispatcher.submit(transport.BleakScanner.discover(timeout=5))
+        future.add_done_callback(lambda fut: self.root.after(0, lambda: self.show_devices(fut.result())))
 
-    def scan_devices(self):
-        devices = asyncio.run(BleakScanner.discover(timeout=5))
+    def show_devices(self, devices):
         # Clear previous results
         for row in self.tree.get_children():
             self.tree.delete(row)
@@ -143,11 +153,11 @@ class BLEScannerApp:
             return
         address = self.tree.item(selected_item)["values"][0]
         param_window = tk.Toplevel(self.root)
-        MultiParamEditor(param_window, address)
+        MultiParamEditor(param_window, address, self.dispatcher)
 
 
 # ---------- Main ----------
 if __name__ == "__main__":
     root = tk.Tk()
-    app = BLEScannerApp(root)
+    app = BLEScannerApp(root, GattDispatcher())
     root.mainloop()
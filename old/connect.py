@@ -1,6 +1,11 @@
-import struct
 import asyncio
 from bleak import BleakClient, BleakScanner, BleakError
+import os
+import sys
+
+# utils/ lives in the repo root: works as python old/connect.py or python -m old.connect
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.decoder import Decoder, ZERO_G_OFFSET
 
 # address = "D5:D0:F9:30:83:D7"     # 1 axis
 address = "FA:E2:AD:E2:8D:99"   # 3 axis 40
@@ -12,14 +17,15 @@ GAIN_UUID = "1c930022-d459-11e7-9296-b8e856369374"
 SAMPLE_RATE_UUID = "1c930023-d459-11e7-9296-b8e856369374"
 CALIBRATION_UUID = "1c930029-d459-11e7-9296-b8e856369374"
 
-conversion_factor = 1.0  # fallback default
+decoder = None  # built from calibration and gain once connected
 
 
 def decode_g(data):
-    """Decode raw 16-bit unsigned data into signed G values using conversion_factor."""
+    """Decode raw 16-bit unsigned data into signed G values using the connection's decoder."""
     try:
-        samples = struct.unpack('<' + 'H' * (len(data) // 2), data)
-        return [(sample - 32768) * conversion_factor for sample in samples]
+        if decoder is None:
+            return Decoder.counts(data).astype(float) - ZERO_G_OFFSET  # no calibration: counts
+        return decoder.decode(data)
     except Exception as e:
         print("Error decoding data:", e)
         return []
@@ -34,8 +40,9 @@ def handle_notification(sender, data):
 
 
 async def connect_and_listen(address):
-    global conversion_factor
+    global decoder
     client = None
+    gain = 1
 
     try:
         print(f"Connecting to {address}")
@@ -55,11 +62,11 @@ async def connect_and_listen(address):
         try:
             cal_bytes = await client.read_gatt_char(CALIBRATION_UUID)
             calibration = int.from_bytes(cal_bytes, byteorder='little')
-            conversion_factor = 3.81 / calibration
-            print(f"Calibration: {calibration}, Conversion Factor: {conversion_factor:.6f}")
+            decoder = Decoder.from_params({"calibration": calibration, "gain": gain})
+            print(f"Calibration: {calibration}, Conversion Factor: {decoder.scale:.6f}")
         except Exception as e:
             print(f"Error reading CALIBRATION: {e}")
-            conversion_factor = 1.0  # fallback
+            decoder = None
 
         # Start notifications
         await client.start_notify(DATA_UUID, handle_notification)
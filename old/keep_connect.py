@@ -1,7 +1,12 @@
 # reconnect in every 20 seconds
-import struct
 import asyncio
 from bleak import BleakClient, BleakScanner, BleakError
+import os
+import sys
+
+# utils/ lives in the repo root: works as python old/keep_connect.py or python -m old.keep_connect
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.decoder import Decoder, ZERO_G_OFFSET
 #
 
 # SENSOR_ADDRESSES = [
@@ -20,20 +25,20 @@ SAMPLE_RATE_UUID = "1c930023-d459-11e7-9296-b8e856369374"
 
 CALIBRATION_UUID = "1c930029-d459-11e7-9296-b8e856369374"
 
-conversion_factor = 1.0
+decoder = None  # built from calibration and gain once connected
 
 def decode_g(data):
-    samples = struct.unpack('<' + 'H' * (len(data) // 2), data)
-    # Convert to signed: 0g is 0x8000, scale using formula
-    accel_g = [(sample - 32768) * conversion_factor for sample in samples]
-    return accel_g
+    # Convert to signed: 0g is 0x8000, scale using formula (counts until calibration is known)
+    if decoder is None:
+        return Decoder.counts(data).astype(float) - ZERO_G_OFFSET
+    return decoder.decode(data)
 
 
 def handle_notification(sender, data):
     values_g = decode_g(data)
 
     # Example: round to 2 decimal places
-    rounded_values = [round(v, 2) for v in values_g]
+    rounded_values = [round(v, 2) for v in values_g.tolist()]
 
     # Convert to comma-separated string
     values_str = ", ".join(map(str, rounded_values))
@@ -41,7 +46,7 @@ def handle_notification(sender, data):
     print(f"Notification from {sender}: [{values_str}]")
 
 async def connect_and_listen(address):
-    global conversion_factor
+    global decoder
     client = None
 
     while True:
@@ -60,6 +65,7 @@ async def connect_and_listen(address):
                 print("Connected.")
 
                 # Read gain value
+                gain = 1
                 try:
                     gain_bytes = await client.read_gatt_char(GAIN_UUID)
                     gain = int.from_bytes(gain_bytes, byteorder='little')
@@ -71,9 +77,9 @@ async def connect_and_listen(address):
                 try:
                     cal_bytes = await client.read_gatt_char(CALIBRATION_UUID)
                     calibration = int.from_bytes(cal_bytes, byteorder='little')
-                    conversion_factor = 3.81 / calibration
+                    decoder = Decoder.from_params({"calibration": calibration, "gain": gain})
                     print(f"Calibration: {calibration} (raw bytes: {cal_bytes.hex()})")
-                    print(f"conversion_factor: {conversion_factor}")
+                    print(f"conversion_factor: {decoder.scale}")
                 except Exception as e:
                     print(f"Failed to read Calibration characteristic: {e}")
 
@@ -1,25 +1,55 @@
 import asyncio
-import threading
+import atexit
+import os
 import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-from bleak import BleakScanner, BleakClient
+from utils import transport
 import subprocess
 from a_sensor import ASensorParameterApp, SensorConnection
 from utils.plot_utils import  start_acceleration_stream_Scanner
 # from utils.plot_utils import start_acceleration_stream
-from utils.sensor_map import UUID_MAP, MAPPINGS  # Ensure you have these mappings
+from utils.sensor_map import BLUVIB_SERVICE_UUID
+from utils.ring_buffer import SensorRingBuffer
+from utils.connect_orchestrator import ConnectionOrchestrator
+from utils.gatt_dispatcher import GattDispatcher
+from utils.param_cache import ParamCache
+from utils.device_registry import DeviceRegistry
+from utils.capture import CaptureWriter, capture_path
+from utils.archive import ArchiveWriter
+from utils.spectral_worker import SpectralWorker
+from utils.spectral import mapped
 
 
 # TODO button of clear_capture and
 
+# Raw registers read at every session start: they describe how to decode, time and transform the stream
+STREAM_SETTINGS = ("calibration", "gain", "sample_rate", "axes", "trace_len")
+
+
+def is_bluvib(device, adv=None):
+    """Match by name prefix or by the advertised BluVib service UUID (as old/blueVib_scanner.py does)."""
+    name = (adv.local_name if adv else None) or device.name or ""
+    if name.startswith("BluVib"):
+        return True
+    uuids = adv.service_uuids if adv else []
+    return any(u.lower() == BLUVIB_SERVICE_UUID for u in uuids or [])
+
+
 class BLEDeviceScanner:
-    def __init__(self, root, loop):
-        self.loop = loop
+    def __init__(self, root, dispatcher, scan_mode="passive", max_concurrent_connects=3, connect_timeout=20.0,
+                 capture_dir=None, archive_dir=None, archive_drop_bits=0, retry_delay=2.0, max_retry_delay=60.0):
+        self.dispatcher = dispatcher
+        self.capture_dir = capture_dir  # when set, raw notifications of every sensor are recorded there
+        self.archive_dir = archive_dir  # when set, samples are also kept in the compressed archive
+        self.archive_drop_bits = archive_drop_bits  # low bits the archive rounds away (0: lossless)
+        self.loop = dispatcher.loop  # the one loop that owns every BleakClient
+        self.scan_mode = scan_mode  # "passive": continuous advertisement callbacks, "discover": periodic discover()
         self.root = root
         self.root.title("BluVib Devices")
 
-        columns = ("Mac Address", "BLE Name", "Connected", "Mode", "Count_Connect", "Count_Notify", "Seen", "Action")
+        columns = ("Mac Address", "BLE Name", "Connected", "Mode", "Count_Connect", "Count_Notify", "Samples",
+                   "Gaps", "Duplicates", "RSSI", "Seen", "Action")
         self.tree = ttk.Treeview(root, columns=columns, show="headings")
         for col in columns:
             self.tree.heading(col, text=col)
@@ -27,115 +57,277 @@ class BLEDeviceScanner:
         self.tree.pack(fill=tk.BOTH, expand=True)
 
         self.tree.bind("<ButtonRelease-1>", self.on_click)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.device_map = {}  # {address: {...}}
         self.device_clients = {}    # Address → connected BleakClient
-        threading.Thread(target=self.scan_loop, daemon=True).start()
-
-
+        self._new_devices = None    # asyncio.Queue of addresses seen for the first time (passive mode)
+        self.retry_delay = retry_delay  # after a failed bring-up; doubles per failure up to max_retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._retry = {}            # Address → (failed bring-ups in a row, monotonic time of the next try)
+        self._refresh_pending = False
+        self.orchestrator = ConnectionOrchestrator(max_concurrent_connects, connect_timeout)
+        self.param_cache = ParamCache()  # (address, param) -> value, shared with every device window
+        self.registry = DeviceRegistry()  # known sensors, persisted in known_devices.json
+        self.spectral_worker = SpectralWorker(root)  # FFTs for every device window, off the Tk thread
+        self.refresh_periodically()
+        self.scan_loop()
 
     def scan_loop(self):
-        asyncio.run(self.scan_devices())
+        if self.scan_mode == "passive":
+            self.dispatcher.submit(self.scan_devices_passive())
+        else:
+            self.dispatcher.submit(self.scan_devices())
+
+    def _update_seen(self, device, name, rssi, now):
+        info = self.device_map.setdefault(device.address, {
+            "name": name,
+            "address": device.address,
+            "count_notify": 0,
+            "buffer": SensorRingBuffer(),
+            "connected": False,
+            "mode": "Unknown",  # Qin: in this mode, mode is not read
+            "count_connection": 0,  # starts at 0
+            "seen": now
+        })
+        info["seen"] = now    # time
+        info["rssi"] = rssi
+        if name:
+            info["name"] = name
+        return info
+
+    def on_advertisement(self, device, adv):
+        """BleakScanner detection callback: runs for every advertisement, duplicates included."""
+        if not is_bluvib(device, adv):
+            return
+        self._update_seen(device, adv.local_name or device.name, adv.rssi, time.time())
+        self.registry.remember(device.address, name=adv.local_name or device.name, device=device)
+        if device.address not in self.device_clients and self.may_retry(device.address):
+            # Register right away so repeated advertisements are not queued twice
+            self.device_clients[device.address] = SensorConnection(device.address, registry=self.registry)
+            self._new_devices.put_nowait(device.address)
+
+    async def scan_devices_passive(self):
+        """Keep the radio scanning and start sessions as soon as new sensors advertise."""
+        self._new_devices = asyncio.Queue()
+        scanner = transport.BleakScanner(detection_callback=self.on_advertisement)
+        await scanner.start()
+        bring_ups = set()
+        try:
+            while True:
+                try:
+                    address = await asyncio.wait_for(self._new_devices.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                # Drain everything that arrived together and bring it up as one batch
+                addresses = [address]
+                while not self._new_devices.empty():
+                    addresses.append(self._new_devices.get_nowait())
+                task = asyncio.create_task(self.connect_new_devices(addresses))
+                bring_ups.add(task)
+                task.add_done_callback(bring_ups.discard)
+                self.request_refresh()
+        finally:
+            await scanner.stop()
+
+    async def connect_new_devices(self, addresses):
+        """Bring up sensors concurrently (bounded by the orchestrator); failures are retried on a later sighting."""
+        connections = [self.device_clients.setdefault(a, SensorConnection(a, registry=self.registry,
+                                                                          before_disconnect=self.on_sensor_disconnecting))
+                       for a in addresses]
+        results = await self.orchestrator.bring_up_all(connections, self.on_sensor_connected)
+        for conn, ok in zip(connections, results):
+            if ok:
+                self._retry.pop(conn.address, None)
+            else:
+                self.device_clients.pop(conn.address, None)
+                self.back_off(conn.address)
+        self.request_refresh()
+
+    def may_retry(self, address):
+        """False while a sensor whose bring-up failed is still backing off."""
+        retry = self._retry.get(address)
+        return retry is None or time.monotonic() >= retry[1]
+
+    def back_off(self, address):
+        """Hold off the next bring-up of ``address``: retry_delay, doubled per failure in a row, capped."""
+        failures = self._retry.get(address, (0, 0.0))[0] + 1
+        delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+        self._retry[address] = (failures, time.monotonic() + delay)
+        print(f"Bring-up of {address} failed ({failures} in a row), next try in {delay:.0f} s")
 
     async def scan_devices(self):
         while True:
-            found_devices = await BleakScanner.discover()
+            found = await transport.BleakScanner.discover(return_adv=True)
             now = time.time()
 
-            found_addresses = set()
-
-            for dev in found_devices:
-                if dev.name and dev.name.startswith("BluVib"):
-                    found_addresses.add(dev.address)
-                    info = self.device_map.setdefault(dev.address, {
-                        "name": dev.name,
-                        "address": dev.address,  # Add this line here
-                        "count_notify": 0,
-                        "data": [],
-                        "connected": False,
-                        "mode": "Unknown",  # Qin: in this mode, mode is not read
-                        "count_connection": 0,  # starts at 0
-                        "seen": now
-                    })
-                    info["seen"] = now    # time
-
-                    # Ensure we have a persistent BleakClient
-                    if dev.address not in self.device_clients:
-                        # Create a persistent wrapper
-                        sensor_conn = SensorConnection(dev.address)
-                        self.device_clients[dev.address] = sensor_conn
-                        try:
-                            await sensor_conn.connect()
-                            print(f"Connected to {dev.address}")
-                        except Exception as e:
-                            print(f"Failed to connect {dev.address}:", e)
-                            continue
-                    else:
-                        sensor_conn = self.device_clients[dev.address]
-                        await sensor_conn.connect()  # reconnect if needed
-
-                    # if sensor_conn.is_connected:
-                    client = sensor_conn.get_client()
-                    if client and client.is_connected:
-                        info["connected"] = True
-                        info["mode"] = await self.read_value_async(sensor_conn, "mode")
-                        info["count_connection"] += 1
-                        info["count_notify"] = 0
-                        info["calibration"] = await self.read_value_async(sensor_conn, "calibration")
-                        start_acceleration_stream_Scanner(client, info, self.loop, info["calibration"])
-                        info["data"] = []
-                    else:
-                        info["connected"] = False
-
-                    self.refresh_table()
+            for dev, adv in found.values():
+                if is_bluvib(dev, adv):
+                    self._update_seen(dev, adv.local_name or dev.name, adv.rssi, now)
+                    self.registry.remember(dev.address, name=adv.local_name or dev.name, device=dev)
+
+            # Known sensors keep their session; the scan only marks them as seen
+            new_addresses = [dev.address for dev, adv in found.values()
+                             if is_bluvib(dev, adv) and dev.address not in self.device_clients
+                             and self.may_retry(dev.address)]
+            if new_addresses:
+                await self.connect_new_devices(new_addresses)
+
+            self.request_refresh()
             await asyncio.sleep(10)
 
+    async def on_sensor_connected(self, sensor_conn):
+        """Session setup, run once per established link: read mode/calibration and subscribe."""
+        address = sensor_conn.address
+        info = self.device_map[address]
+        client = sensor_conn.get_client()
+        info["connected"] = True
+        async with self.orchestrator.stage(address, "mode"):
+            info["mode"] = await self.read_value_async(client, "mode")
+        info["count_connection"] += 1
+        info["count_notify"] = 0
+        async with self.orchestrator.stage(address, "calibration"):
+            info["calibration"] = await self.read_value_async(client, "calibration")
+        if info["calibration"].isdigit():
+            self.registry.remember(address, calibration=int(info["calibration"]))
+        async with self.orchestrator.stage(address, "settings"):
+            info["stream"] = await self.read_stream_settings(client)
+        info["buffer"].clear()
+        await self.close_recorders(address)  # the previous session's, if its link dropped
+        if self.capture_dir or self.archive_dir:
+            self.open_recorders(info)
+        async with self.orchestrator.stage(address, "stream"):
+            subscribed = start_acceleration_stream_Scanner(client, info, self.loop, info["calibration"])
+            if subscribed is None:
+                raise ValueError(f"{address}: no usable calibration ({info['calibration']!r})")
+            await asyncio.wrap_future(subscribed)  # a failed start_notify fails the bring-up
+        self.request_refresh()
+
+    async def read_stream_settings(self, client):
+        """Raw register values that describe the data stream (cached, so normally free after the first session)."""
+        values = await self.param_cache.get_or_read(client, client.address, list(STREAM_SETTINGS))
+        return {key: (None if isinstance(v, Exception) else v[0]) for key, v in values.items()}
+
+    async def on_sensor_disconnecting(self, sensor_conn):
+        """Runs before SensorConnection.disconnect closes the link: write out what is still recording."""
+        await self.close_recorders(sensor_conn.address)
+
+    @staticmethod
+    def take_recorders(info):
+        """Detach the capture / archive writers from ``info``, so the notification handler stops feeding them."""
+        writers = [info[key] for key in ("capture", "archive") if info.get(key)]
+        info["capture"] = info["archive"] = None
+        return writers
+
+    async def close_recorders(self, address):
+        """Write out and close the sensor's capture file / archive segment.
+
+        Runs on the GATT loop, as the notification handler does, so no notification
+        is recorded halfway; the writers' threads are joined off the loop.
+        """
+        info = self.device_map.get(address)
+        for writer in self.take_recorders(info) if info else []:
+            await asyncio.to_thread(writer.close)
+
+    def open_recorders(self, info):
+        """Start a new capture file / archive segment for this session, tagged with the sensor's stream settings."""
+        raw = {key: value or 0 for key, value in info["stream"].items()}
+        sample_rate = mapped("sample_rate", raw["sample_rate"], 0)
+        address = info["address"]
+        if self.capture_dir:
+            path = capture_path(self.capture_dir, address)
+            info["capture"] = CaptureWriter(path, address, raw["calibration"], gain=raw["gain"],
+                                            sample_rate=sample_rate, axes=raw["axes"])
+            print(f"Recording {address} to {path}")
+        if self.archive_dir and raw["calibration"]:
+            info["archive"] = ArchiveWriter(self.archive_dir, address, raw["calibration"], gain=raw["gain"],
+                                            sample_rate=sample_rate, axes=raw["axes"],
+                                            drop_bits=self.archive_drop_bits)
+            print(f"Archiving {address} to {info['archive'].directory}")
+
     def connect_device(self, address):
         client = self.device_clients.get(address)
         if client and not client.is_connected:
-            import asyncio
-            asyncio.run(client.connect())
-            print(f"Connected to {address}")
+            # Through the orchestrator, so a failed session setup is reported and the link dropped
+            self.dispatcher.submit(self.orchestrator.bring_up(client, self.on_sensor_connected))
+            print(f"Connecting to {address}")
 
     def disconnect_device(self, address):
         client = self.device_clients.get(address)
         if client and client.is_connected:
-            import asyncio
-            asyncio.run(client.disconnect())
-            print(f"Disconnected from {address}")
+            self.dispatcher.submit(client.disconnect())
+            print(f"Disconnecting from {address}")
 
-    async def read_value_async(self, client, para):
-        """Async version for reading mode characteristic."""
+    async def read_value_async(self, client, para, fresh=False):
+        """Async version for reading mode characteristic; served from the parameter cache when valid."""
         try:
             if hasattr(client, "get_client"):
                 client = client.get_client()  # unwrap SensorConnection
-            uuid, byte_size = UUID_MAP[para]
-            value_bytes = await client.read_gatt_char(uuid)
-            raw_val = int.from_bytes(value_bytes, byteorder="little")
-
-            mapping = MAPPINGS.get(para, None)
-            if mapping:
-                return dict(mapping).get(raw_val, f"Unknown ({raw_val})")
-            return str(raw_val)
+            value = (await self.param_cache.get_or_read(client, client.address, [para], fresh=fresh))[para]
+            if isinstance(value, Exception):
+                raise value
+            raw_val, label = value
+            if label == "Unknown":
+                return f"Unknown ({raw_val})"
+            return label
         except Exception as e:
             print("Failed to read :", para, e)
             return f"Error: {e}"
 
+    async def shutdown(self):
+        """End every session: each sensor's recorders are written out before its link is closed."""
+        await asyncio.gather(*(conn.disconnect() for conn in list(self.device_clients.values())),
+                             return_exceptions=True)
+        for address in list(self.device_map):
+            await self.close_recorders(address)  # sensors whose link was already down
+
+    def on_close(self, timeout=10.0):
+        """Window closed: shut the sessions down, then leave the main loop."""
+        try:
+            self.dispatcher.submit(self.shutdown()).result(timeout=timeout)
+        except Exception as e:
+            print(f"Shutdown incomplete: {e}")
+        self.root.destroy()
+
+    def close_all_recorders(self):
+        """Last resort at interpreter exit (e.g. Ctrl+C in the main loop): write out whatever still records."""
+        for info in list(self.device_map.values()):
+            for writer in self.take_recorders(info):
+                writer.close()
+
+    def refresh_periodically(self, interval=1000):
+        """Redraw the table every ``interval`` ms ("Seen"/RSSI), on the Tk thread."""
+        self.refresh_table()
+        self.root.after(interval, self.refresh_periodically, interval)
+
+    def request_refresh(self):
+        """Redraw the table soon; safe to call from the asyncio thread, repeated calls are merged."""
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.root.after(0, self.refresh_table)
+
     def refresh_table(self):
-        print("Refreshing UI table")
+        """Tk thread only: use request_refresh from coroutines."""
+        self._refresh_pending = False
         self.tree.delete(*self.tree.get_children())
         # print("map, ", self.device_map.items())
         for addr, info in self.device_map.items():
             seen_diff = int(time.time() - info["seen"])
             seen_str = time.strftime("%Hh %Mm %Ss ago", time.gmtime(seen_diff))
-            print(info["data"])
+            sensor_conn = self.device_clients.get(addr)
+            connected = sensor_conn.is_connected if sensor_conn else info["connected"]
+            stats = info.get("stream_stats")
             self.tree.insert("", tk.END, values=(
                 addr,
                 info["name"],
-                str(info["connected"]),
+                str(connected),
                 info.get("mode", "Unknown"),       # Display last known mode
                 info["count_connection"],
-                len(info["data"]),
+                info.get("count_notify", 0),
+                stats.summary() if stats else "",  # received/expected samples
+                len(stats.gap_runs) if stats else "",
+                stats.duplicates if stats else "",
+                info.get("rssi", ""),
                 seen_str,
                 "View"
             ))
@@ -147,40 +339,31 @@ class BLEDeviceScanner:
         # if sensor_address in self.device_map:
         #     self.device_map[sensor_address]["connected"] = False
         #     print(f"App1: Marked sensor {sensor_address} as disconnected after commit")
-        sensor_conn = self.device_clients.get(sensor_address)
-
-        if sensor_conn:
-            # Reconnect existing object (UI still holds reference)
-            await sensor_conn.reconnect()
-        else:
-            # First time connecting for this sensor
-            sensor_conn = SensorConnection(sensor_address)
-            await sensor_conn.connect()
-            self.device_clients[sensor_address] = sensor_conn
-
         now = time.time()
         info = self.device_map.setdefault(sensor_address, {
-            "name": sensor_conn.get_client().name if sensor_conn.get_client() else "Unknown",
+            "name": "Unknown",
             "address": sensor_address,
             "connected": False,
             "mode": "Manual",
-            "data": [],
+            "buffer": SensorRingBuffer(),
             "count_connection": 0,
             "seen": now,
             "calibration": 0
         })
         info["seen"] = now  # time
 
-        if sensor_conn.is_connected:
-            info["connected"] = True
-            info["mode"] = await self.read_value_async(sensor_conn.get_client(), "mode")
-            info["count_connection"] += 1
-            print("Get data***********")
-
+        sensor_conn = self.device_clients.get(sensor_address)
+        if sensor_conn:
+            # Reconnect existing object (UI still holds reference); the session re-subscribes
+            await sensor_conn.reconnect()
         else:
-            info["connected"] = False
+            # First time connecting for this sensor
+            sensor_conn = SensorConnection(sensor_address, registry=self.registry)
+            self.device_clients[sensor_address] = sensor_conn
+            await self.orchestrator.bring_up(sensor_conn, self.on_sensor_connected)
 
-        self.refresh_table()
+        info["connected"] = sensor_conn.is_connected
+        self.request_refresh()
 
     def on_click(self, event):
         """Handle clicks on the 'View' action column."""
@@ -203,21 +386,22 @@ class BLEDeviceScanner:
         if not sensor_conn:
             tk.messagebox.showerror("Error", f"No connected client found for {address}")
             return
-        ASensorParameterApp(win, self, address, name, sensor_conn, self.loop)
-
-
-def start_loop(loop):
-    asyncio.set_event_loop(loop)
-    loop.run_forever()
+        ASensorParameterApp(win, self, address, name, sensor_conn, self.dispatcher)
 
 
 if __name__ == "__main__":
     root = tk.Tk()
 
-    loop = asyncio.new_event_loop()
-    # Start the event loop in a new thread
-    loop_thread = threading.Thread(target=start_loop, args=(loop,), daemon=True)
-    loop_thread.start()
-
-    app = BLEDeviceScanner(root, loop)
+    # One event loop in one background thread runs every BLE operation
+    dispatcher = GattDispatcher()
+
+    # BLUVIB_CAPTURE_DIR=captures python scanner3.py records every sensor's raw stream
+    # BLUVIB_ARCHIVE_DIR=archive keeps them compressed and indexed by time for long-running monitoring,
+    # BLUVIB_ARCHIVE_DROP_BITS=4 in a smaller, lower-precision form
+    capture_dir = os.environ.get("BLUVIB_CAPTURE_DIR")
+    if capture_dir:
+        os.makedirs(capture_dir, exist_ok=True)
+    app = BLEDeviceScanner(root, dispatcher, capture_dir=capture_dir, archive_dir=os.environ.get("BLUVIB_ARCHIVE_DIR"),
+                           archive_drop_bits=int(os.environ.get("BLUVIB_ARCHIVE_DROP_BITS", "0")))
+    atexit.register(app.close_all_recorders)
     root.mainloop()
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from utils.archive import Archive, ArchiveWriter
+from utils.capture import CaptureReader, CaptureWriter
+
+ADDRESS = "5E:00:00:00:00:01"
+
+
+def payloads(count, values=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 65536, values, dtype=np.uint16).astype("<u2").tobytes() for _ in range(count)]
+
+
+def test_capture_round_trip(tmp_path):
+    path = str(tmp_path / "stream.bvcap")
+    sent = payloads(50)
+    writer = CaptureWriter(path, ADDRESS, 7813, gain=2, sample_rate=25600, axes=3)
+    for n, payload in enumerate(sent):
+        writer.record(payload, timestamp=10.0 + n)
+    writer.close()
+    reader = CaptureReader(path)
+    assert (reader.address, reader.calibration, reader.gain, reader.sample_rate, reader.axes) == \
+        (ADDRESS, 7813, 2, 25600, 3)
+    assert reader.uniform and reader.sequence.tolist() == list(range(50))
+    assert reader.timestamps.tolist() == [10.0 + n for n in range(50)]
+    assert reader.payloads() == sent
+
+
+def test_capture_with_mixed_payload_sizes(tmp_path):
+    path = str(tmp_path / "mixed.bvcap")
+    sent = payloads(3) + payloads(1, values=10, seed=1)
+    writer = CaptureWriter(path, ADDRESS, 7813)
+    for payload in sent:
+        writer.record(payload, timestamp=1.0)
+    writer.close()
+    reader = CaptureReader(path)
+    assert not reader.uniform
+    assert reader.payloads() == sent
+
+
+def write_archive(root, raw, drop_bits=0, chunk_frames=256, axes=3, sample_rate=1000):
+    writer = ArchiveWriter(str(root), ADDRESS, 7813, sample_rate=sample_rate, axes=axes,
+                           chunk_frames=chunk_frames, drop_bits=drop_bits)
+    per_packet = 48
+    for n in range(0, len(raw), per_packet):
+        writer.append(raw[n:n + per_packet], 1000.0 + n / (sample_rate * axes))
+    writer.close()
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_archive_round_trip(tmp_path, codec):
+    raw = np.random.default_rng(2).integers(0, 65536, 3000 * 3, dtype=np.uint16)
+    writer = ArchiveWriter(str(tmp_path), ADDRESS, 7813, sample_rate=1000, axes=3, chunk_frames=256, codec=codec)
+    writer.append(raw, 1000.0)
+    writer.close()
+    result = Archive(str(tmp_path)).read_range(ADDRESS, 0, 2000, calibrated=False)
+    assert np.array_equal(result.samples, raw)
+    assert (result.sample_rate, result.axes, result.calibration) == (1000, 3, 7813)
+
+
+def test_archive_range_query_cuts_whole_frames(tmp_path):
+    raw = np.arange(3000 * 3, dtype=np.uint16)
+    write_archive(tmp_path, raw)
+    result = Archive(str(tmp_path)).read_range(ADDRESS, 1001.0, 1001.5, calibrated=False)
+    # Frames 1000 up to 1500 at 1000 frames/s, three values each
+    assert result.samples.size % 3 == 0
+    assert result.samples[0] == 3000 and result.samples[-1] == 4499
+    assert result.times[0] >= 1001.0 and result.times[-1] < 1001.5
+
+
+def test_archive_lower_precision_tier(tmp_path):
+    raw = np.random.default_rng(3).integers(0, 65536, 3000 * 3, dtype=np.uint16)
+    write_archive(tmp_path, raw, drop_bits=4)
+    result = Archive(str(tmp_path)).read_range(ADDRESS, 0, 2000, calibrated=False)
+    assert result.samples.size == raw.size
+    assert np.abs(result.samples.astype(np.int32) - raw).max() <= 8
+    assert not (result.samples % 16).any()
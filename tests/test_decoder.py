@@ -0,0 +1,24 @@
+import numpy as np
+
+from utils.decoder import ZERO_G_OFFSET, Decoder, conversion_factor, deinterleave
+
+
+def test_encode_decode_round_trip():
+    decoder = Decoder(7813)
+    counts = np.array([0, 1, ZERO_G_OFFSET, 40000, 65535], dtype="<u2")
+    assert np.array_equal(decoder.encode(decoder.decode(counts.tobytes())), counts)
+
+
+def test_table_and_arithmetic_paths_agree():
+    decoder = Decoder(7813)
+    counts = np.arange(0, 65536, 7, dtype="<u2")  # longer than LOOKUP_LIMIT: arithmetic path
+    assert len(counts) > Decoder.LOOKUP_LIMIT
+    expected = (counts.astype(np.float64) - ZERO_G_OFFSET) * conversion_factor(7813)
+    np.testing.assert_allclose(decoder.decode(counts), expected, rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(decoder.decode(counts[:64]), expected[:64], rtol=1e-6, atol=1e-9)
+
+
+def test_deinterleave_follows_axis_phase():
+    values = np.arange(10)
+    frames = deinterleave(values, first_index=2, axes=3)  # values[0] is axis 2 of its frame
+    assert frames.tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
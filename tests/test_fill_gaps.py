@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from utils.stream_stats import fill_gaps
+
+
+def test_zero_fill_puts_values_back_at_their_index():
+    values = np.array([0, 1, 2, 3, 6, 7], dtype=np.float32)  # stream indices 4 and 5 lost
+    assert fill_gaps(values, 0, [(4, 2)], method="zero").tolist() == [0, 1, 2, 3, 0, 0, 6, 7]
+
+
+def test_linear_fill_interpolates_per_axis():
+    stream = np.arange(20, dtype=np.float64).reshape(10, 2) * [1, -1]  # axis 0 rising, axis 1 falling
+    flat = stream.ravel()
+    received = np.concatenate([flat[:6], flat[10:]])  # frames 3 and 4 lost
+    filled = fill_gaps(received, 0, [(6, 4)], axes=2)
+    np.testing.assert_allclose(filled, flat)
+
+
+def test_first_index_offsets_the_gap_and_the_axis_phase():
+    flat = np.arange(100, 112, dtype=np.float64)
+    received = np.concatenate([flat[:4], flat[7:]])  # stream indices 104..106 lost
+    filled = fill_gaps(received[1:], 101, [(104, 3)], axes=3)
+    np.testing.assert_allclose(filled, flat[1:])
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        fill_gaps(np.zeros(4), 0, [(2, 2)], method="cubic")
@@ -0,0 +1,61 @@
+import asyncio
+
+from utils.param_cache import ParamCache
+from utils.param_transaction import COMMIT_UUID, ParamTransaction
+
+ADDRESS = "5E:00:00:00:00:01"
+
+
+class FakeClient:
+    """Accepts parameter writes; the commit write fails when ``fail_commit`` is set."""
+
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+        self.writes = []
+
+    async def write_gatt_char(self, uuid, data):
+        if uuid == COMMIT_UUID and self.fail_commit:
+            raise asyncio.TimeoutError()
+        self.writes.append((uuid, bytes(data)))
+
+
+def transaction():
+    cache = ParamCache()
+    cache.put(ADDRESS, "axes", (3, "3"))
+    return ParamTransaction(ADDRESS, cache, baseline={"axes": 3, "gain": 0}), cache
+
+
+def test_changes_are_only_the_values_that_differ():
+    tx, _ = transaction()
+    tx.stage("axes", 3)   # as cached
+    tx.stage("gain", 1)   # differs from the baseline
+    assert tx.changes() == {"gain": 1}
+    tx.discard("gain")
+    assert tx.changes() == {}
+
+
+def test_writes_do_not_touch_the_cache():
+    tx, cache = transaction()
+    tx.stage("axes", 1)
+    written = asyncio.run(tx.write_changes(FakeClient()))
+    assert written == ["axes"]
+    assert cache.get(ADDRESS, "axes") == (3, "3")
+    assert tx.changes() == {"axes": 1}
+
+
+def test_failed_commit_drops_the_written_keys():
+    tx, cache = transaction()
+    tx.stage("axes", 1)
+    client = FakeClient(fail_commit=True)
+
+    async def write_and_commit():
+        await tx.write_changes(client)
+        await tx.commit(client)
+
+    try:
+        asyncio.run(write_and_commit())
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("the commit should have failed")
+    assert cache.get(ADDRESS, "axes") is None
@@ -0,0 +1,41 @@
+import numpy as np
+
+from utils.ring_buffer import SensorRingBuffer
+
+
+def filled(rows, capacity=4, width=4):
+    buffer = SensorRingBuffer(capacity=capacity)
+    for row in range(rows):
+        buffer.append(float(row), row, row, np.arange(row * width, (row + 1) * width))
+    return buffer
+
+
+def test_latest_after_wrap_is_contiguous_and_ordered():
+    buffer = filled(6)
+    view = buffer.latest()
+    assert len(buffer) == 4 and buffer.total == 6
+    assert view.timestamps.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert view.samples[:, 0].tolist() == [8, 12, 16, 20]
+    assert buffer.latest(2).timestamps.tolist() == [4.0, 5.0]
+
+
+def test_extend_matches_append_across_the_wrap():
+    appended = filled(7)
+    extended = filled(2)
+    rows = np.arange(2, 7)
+    extended.extend(rows.astype(float), rows, rows, np.arange(8, 28).reshape(5, 4))
+    assert np.array_equal(extended.latest().samples, appended.latest().samples)
+    assert np.array_equal(extended.latest().timestamps, appended.latest().timestamps)
+    assert extended.end_index == appended.end_index == 28
+
+
+def test_stream_cuts_padding_and_starts_after_a_break():
+    buffer = SensorRingBuffer(capacity=8)
+    buffer.append(0.0, 0, 0, np.arange(4), first_index=0)
+    buffer.append(1.0, 0, 0, np.arange(100, 104), first_index=12)  # 8 values lost before this row
+    buffer.append(2.0, 0, 0, np.arange(104, 106))                  # short row: zero-padded
+    values, end = buffer.stream()
+    assert values.tolist() == [100, 101, 102, 103, 104, 105]
+    assert end == 18
+    values, end = buffer.stream(2)
+    assert values.tolist() == [104, 105] and end == 18
@@ -0,0 +1,44 @@
+from utils.timebase import Timebase
+
+VALUES = 64
+RATE = 25600.0
+
+
+def run(timebase, packets, skip=(), pause_after=None, pause=0.0):
+    """Feed ``packets`` evenly timed packets, dropping the numbers in ``skip``; returns the PacketTimes."""
+    results = []
+    for n in range(packets):
+        if n in skip:
+            continue
+        arrival = 100.0 + (n + 1) * VALUES / RATE + 0.002
+        if pause_after is not None and n > pause_after:
+            arrival += pause
+        results.append(timebase.on_packet(VALUES, arrival))
+    return results
+
+
+def test_steady_stream_declares_nothing():
+    timebase = Timebase(sample_rate=RATE)
+    run(timebase, 2000)
+    assert timebase.gaps == [] and timebase.missing == 0
+    assert timebase.index == 2000 * VALUES
+
+
+def test_lost_packet_is_declared_once_with_its_length():
+    timebase = Timebase(sample_rate=RATE)
+    packets = run(timebase, 2000, skip={800})
+    assert timebase.missing == VALUES
+    assert len(timebase.gaps) == 1
+    gap = next(p for p in packets if p.gap)
+    assert gap.gap == VALUES
+    # The loss is located before the packets that were placed too early
+    assert gap.late_from <= 800 * VALUES <= gap.late_to
+    assert timebase.index == 2000 * VALUES
+
+
+def test_silence_restarts_without_a_gap():
+    timebase = Timebase(sample_rate=RATE)
+    packets = run(timebase, 1500, pause_after=600, pause=3.0)
+    assert timebase.gaps == []
+    assert timebase.restarts == [601 * VALUES]
+    assert sum(p.restart for p in packets) == 1
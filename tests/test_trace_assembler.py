@@ -0,0 +1,43 @@
+import numpy as np
+
+from utils.trace_assembler import TraceAssembler
+
+
+def assembler(settle=0):
+    traces = TraceAssembler(trace_len=8, axes=1, sample_rate=1000, settle=settle, clock=lambda: 0.0)
+    emitted = []
+    traces.subscribe(lambda trace: emitted.append((trace.index, trace.data.ravel().tolist(), trace.complete)))
+    return traces, emitted
+
+
+def test_packets_straddling_boundaries_are_split():
+    traces, emitted = assembler()
+    for first in range(0, 24, 6):
+        traces.feed(np.arange(first, first + 6, dtype=np.float32), first)
+    assert [e[0] for e in emitted] == [0, 1, 2]
+    assert all(complete for _, _, complete in emitted)
+    assert emitted[1][1] == list(range(8, 16))
+
+
+def test_gap_zeroes_and_marks_the_trace():
+    traces, emitted = assembler()
+    traces.feed(np.arange(0, 4, dtype=np.float32), 0)
+    traces.feed(np.arange(6, 8, dtype=np.float32), 6)
+    assert emitted == [(0, [0, 1, 2, 3, 0, 0, 6, 7], False)]
+    assert traces.incomplete == 1
+
+
+def test_shift_moves_held_values_and_marks_only_the_loss():
+    traces, emitted = assembler(settle=16)
+    # Values 32..35 were lost, but the stream went on as if they had not been
+    stream = np.arange(64, dtype=np.float32)
+    fed = np.concatenate([stream[:32], stream[36:]])
+    traces.feed(fed[:40], 0)
+    traces.shift(28, 32, 4)  # found late: lost between 28 and 32, later values sit 4 early
+    traces.feed(fed[40:], 44)
+    traces.flush()
+    complete = {index: data for index, data, ok in emitted if ok}
+    assert sorted(complete) == [0, 1, 2, 5, 6, 7]
+    for index, data in complete.items():
+        assert data == list(range(index * 8, index * 8 + 8))
+    assert traces.incomplete == 2  # the trace holding the located range (24..31) and the one with the hole
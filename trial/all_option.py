@@ -3,6 +3,12 @@ import threading
 import tkinter as tk
 from tkinter import ttk
 from bleak import BleakClient
+import os
+import sys
+
+# utils/ lives in the repo root: works as python trial/all_option.py or python -m trial.all_option
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sensor_map import WINDOW_TYPES
 
 ADDRESS = "FA:E2:AD:E2:8D:99"
 SAMPLE_RATE_UUID = "1c930023-d459-11e7-9296-b8e856369374"
@@ -17,8 +23,6 @@ SAMPLE_RATE_MAP = [
     (7, 256)
 ]
 
-WINDOW_TYPES = ["Hann", "Hamming", "Blackman", "Nuttall", "Blackman-Nuttall",
-                "Blackman-Harris", "Flattop",  "Rectangular"]
 OPERATING_MODES = ["Manual", "Wakeup", "Wakeup+", "Ready",
                    "Event", "MotionDetect"]
 TRACE_LENGTHS = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576, 2097152]
@@ -1,17 +1,19 @@
-import asyncio
-import threading
 from tkinter import ttk
 from utils.sensor_map import UUID_MAP_BUTTON  # Make sure your UUID_MAP contains the needed keys
 
 
 class BLEActionButtons:
-    def __init__(self, parent, client):
+    def __init__(self, parent, client, dispatcher, param_cache=None):
         """
         parent: parent Tkinter frame/window where buttons will be placed
-        client: already-connected BleakClient
+        client: already-connected BleakClient (or its SensorConnection)
+        dispatcher: GattDispatcher that owns the client's event loop
+        param_cache: ParamCache to invalidate once a reset/restart/power-off is sent
         """
         self.parent = parent
         self.client = client
+        self.dispatcher = dispatcher
+        self.param_cache = param_cache
 
         # Button definitions: key in UUID_MAP, label, and send byte
         self.actions = [
@@ -42,11 +44,13 @@ class BLEActionButtons:
             print(f"[ERROR] UUID for {uuid_key} not found in UUID_MAP")
             return
 
-        def write_bytes():
+        def on_done(future):
             try:
-                asyncio.run(self.client.write_gatt_char(uuid, data_bytes))
+                future.result()
                 print(f"[OK] Wrote {data_bytes} to {uuid_key}")
+                if self.param_cache:
+                    self.param_cache.invalidate(self.client.address)
             except Exception as e:
                 print(f"[ERROR] Failed to send {uuid_key} command:", e)
 
-        threading.Thread(target=write_bytes, daemon=True).start()
\ No newline at end of file
+        self.dispatcher.write(self.client, uuid, data_bytes).add_done_callback(on_done)
\ No newline at end of file
@@ -0,0 +1,254 @@
+import glob
+import json
+import lzma
+import os
+import queue
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from .decoder import SAMPLE_DTYPE, Decoder
+
+# Layout: <root>/<address without colons>/<segment>.json|.idx|.bva, one segment per
+# writer (i.e. per session), so calibration / sample rate changes start a new segment.
+INDEX_DTYPE = np.dtype([
+    ("t_first", "<f8"),   # wall-clock time of the chunk's first sample
+    ("t_end", "<f8"),     # wall-clock time just after the chunk's last sample
+    ("sample", "<u8"),    # index of the first sample within the segment
+    ("offset", "<u8"),    # byte offset of the compressed chunk in the .bva file
+    ("length", "<u4"),    # compressed size
+    ("count", "<u4"),     # samples in the chunk
+])
+
+CODECS = {
+    "zlib": (lambda b: zlib.compress(b, 6), zlib.decompress),
+    "lzma": (lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+
+ArchiveSlice = namedtuple("ArchiveSlice", ["times", "samples", "sample_rate", "axes", "calibration"])
+
+
+def sensor_dir(root, address):
+    return os.path.join(root, address.replace(":", ""))
+
+
+def quantize(raw, drop_bits):
+    """Round ``raw`` to multiples of ``2 ** drop_bits`` and shift them down (small deltas compress better)."""
+    if not drop_bits:
+        return raw
+    coarse = (raw.astype(np.uint32) + (1 << (drop_bits - 1))) >> drop_bits
+    return np.minimum(coarse, 0xFFFF >> drop_bits).astype(SAMPLE_DTYPE)
+
+
+def delta_encode(raw, axes):
+    """Per-axis first difference with uint16 wraparound, then split into low/high byte planes."""
+    delta = raw.copy()
+    delta[axes:] -= raw[:-axes]
+    return delta.view(np.uint8).reshape(-1, 2).T.tobytes()
+
+
+def delta_decode(data, axes):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, -1)
+    delta = np.ascontiguousarray(planes.T).view(SAMPLE_DTYPE).ravel()
+    raw = np.empty_like(delta)
+    for axis in range(axes):
+        np.cumsum(delta[axis::axes], dtype=SAMPLE_DTYPE, out=raw[axis::axes])
+    return raw
+
+
+class ArchiveWriter:
+    """Appends raw uint16 samples of one sensor session to a chunked, compressed segment.
+
+    Samples are collected in a preallocated chunk of ``chunk_frames * axes`` values;
+    each full chunk is handed to a background thread that delta encodes,
+    compresses, writes and indexes it, so ``append`` stays cheap enough for the
+    notification handler. ``close`` writes what is queued.
+
+    Noisy vibration data only compresses about 2x losslessly. ``drop_bits`` > 0
+    rounds that many low bits away before encoding (a lower-precision tier:
+    the step is ``2 ** drop_bits`` counts), which compresses much further.
+    """
+
+    def __init__(self, root, address, calibration, gain=1, sample_rate=25600, axes=1,
+                 chunk_frames=16384, codec="zlib", start=None, drop_bits=0, max_queue=16):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}, choose from {sorted(CODECS)}")
+        if not 0 <= drop_bits < 16:
+            raise ValueError(f"drop_bits must be 0..15, not {drop_bits}")
+        self.directory = sensor_dir(root, address)
+        os.makedirs(self.directory, exist_ok=True)
+        self.axes = int(axes) or 1
+        self.sample_rate = int(sample_rate)
+        self.codec = codec
+        self.drop_bits = int(drop_bits)
+        self._compress = CODECS[codec][0]
+        self._chunk = np.empty(chunk_frames * self.axes, dtype=SAMPLE_DTYPE)
+        self._fill = 0
+        self._t_first = None
+        self._t_end = None
+        self._sample = 0  # samples already written in earlier chunks
+        self.segment = None
+        self.meta = {"address": address, "calibration": int(calibration), "gain": int(gain),
+                     "sample_rate": self.sample_rate, "axes": self.axes, "codec": codec,
+                     "chunk_samples": len(self._chunk), "drop_bits": self.drop_bits}
+        # Full chunks wait here for the writer thread. A full queue blocks append: live
+        # data never gets there, an import (faster than compression) is paced by it
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        if start is not None:
+            self._open(start)
+
+    def _open(self, start):
+        stamp = int(start * 1000)
+        while os.path.exists(os.path.join(self.directory, f"{stamp:d}.json")):
+            stamp += 1  # two segments starting in the same millisecond (e.g. imported logs)
+        self.segment = os.path.join(self.directory, f"{stamp:d}")
+        self.meta["start"] = start
+        with open(self.segment + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        self._data = open(self.segment + ".bva", "ab")
+        self._index = open(self.segment + ".idx", "ab")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, raw, timestamp):
+        """Add one notification's raw samples (uint16 array) received at ``timestamp``."""
+        if self.segment is None:
+            self._open(timestamp)
+        value_rate = self.sample_rate * self.axes
+        raw = np.asarray(raw, dtype=SAMPLE_DTYPE)
+        while raw.size:
+            if self._fill == 0:
+                self._t_first = timestamp
+            take = min(raw.size, len(self._chunk) - self._fill)
+            self._chunk[self._fill:self._fill + take] = raw[:take]
+            self._fill += take
+            timestamp += take / value_rate if value_rate else 0.0
+            self._t_end = timestamp
+            raw = raw[take:]
+            if self._fill == len(self._chunk):
+                self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self._fill:
+            return
+        self._queue.put((self._chunk[:self._fill].copy(), self._t_first, self._t_end, self._sample))
+        self._sample += self._fill
+        self._fill = 0
+
+    def close(self):
+        if self.segment is None:
+            return
+        self._flush_chunk()
+        self._queue.put(None)
+        self._thread.join()
+        self.segment = None
+
+    def _run(self):
+        data, index = self._data, self._index
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            raw, t_first, t_end, sample = item
+            payload = self._compress(delta_encode(quantize(raw, self.drop_bits), self.axes))
+            entry = np.zeros(1, dtype=INDEX_DTYPE)
+            entry[0] = (t_first, t_end, sample, data.tell(), len(payload), raw.size)
+            data.write(payload)
+            data.flush()
+            index.write(entry.tobytes())  # after its data, so a reader never sees a chunk not yet written
+            index.flush()
+        data.close()
+        index.close()
+
+
+def _first_at(t, t_first, span, n):
+    """First of ``n`` samples evenly spread over ``span`` from ``t_first`` at or after time ``t`` (n if none)."""
+    if span <= 0:
+        return 0 if t <= t_first else n
+    i = min(max(int(np.ceil((t - t_first) * n / span)), 0), n)
+    # Settle float rounding against the times the samples are given
+    while i > 0 and t_first + span * (i - 1) / n >= t:
+        i -= 1
+    while i < n and t_first + span * i / n < t:
+        i += 1
+    return i
+
+
+class Archive:
+    """Read side: time-range queries that only decompress the chunks they touch."""
+
+    def __init__(self, root):
+        self.root = root
+        self._indexes = {}  # segment -> (idx file size, index array)
+
+    def sensors(self):
+        return sorted(os.path.basename(d) for d in glob.glob(os.path.join(self.root, "*")) if os.path.isdir(d))
+
+    def segments(self, address):
+        paths = glob.glob(os.path.join(sensor_dir(self.root, address), "*.json"))
+        return sorted((p[:-5] for p in paths), key=lambda p: int(os.path.basename(p)))
+
+    def index(self, segment):
+        # Live segments keep growing: reload only when the index file has grown
+        size = os.path.getsize(segment + ".idx")
+        cached = self._indexes.get(segment)
+        if cached is None or cached[0] != size:
+            cached = (size, np.fromfile(segment + ".idx", dtype=INDEX_DTYPE, count=size // INDEX_DTYPE.itemsize))
+            self._indexes[segment] = cached
+        return cached[1]
+
+    def read_segments(self, address, t0, t1, calibrated=True):
+        """Yield one ArchiveSlice per segment overlapping [t0, t1)."""
+        for segment in self.segments(address):
+            index = self.index(segment)
+            if not len(index) or index["t_end"][-1] <= t0 or index["t_first"][0] >= t1:
+                continue
+            # Chunks are in time order, so the overlap is one contiguous run of rows
+            first = np.searchsorted(index["t_end"], t0, side="right")
+            last = np.searchsorted(index["t_first"], t1, side="left")
+            if first >= last:
+                continue
+            with open(segment + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            decompress = CODECS[meta["codec"]][1]
+            times, samples = [], []
+            with open(segment + ".bva", "rb") as data:
+                for row in index[first:last]:
+                    data.seek(int(row["offset"]))
+                    raw = delta_decode(decompress(data.read(int(row["length"]))), meta["axes"])
+                    raw <<= meta.get("drop_bits", 0)
+                    # Sample times are spread evenly over the chunk's measured span: find the
+                    # samples inside [t0, t1) from the span, then time only those
+                    n, axes = raw.size, meta["axes"]
+                    t_first, span = row["t_first"], row["t_end"] - row["t_first"]
+                    first_sample = _first_at(t0, t_first, span, n)
+                    end_sample = _first_at(t1, t_first, span, n)
+                    if first_sample >= end_sample:
+                        continue
+                    # Cut on whole frames so interleaved axes stay aligned
+                    start = first_sample // axes * axes
+                    stop = -(-end_sample // axes) * axes
+                    times.append(t_first + span * np.arange(start, stop) / n)
+                    samples.append(raw[start:stop])
+            if not samples:
+                continue
+            raw = np.concatenate(samples)
+            if calibrated:
+                values = Decoder.from_params(meta).decode(raw)
+            else:
+                values = raw
+            yield ArchiveSlice(np.concatenate(times), values, meta["sample_rate"], meta["axes"], meta["calibration"])
+
+    def read_range(self, address, t0, t1, calibrated=True):
+        """Samples of ``address`` between wall-clock times t0 and t1 (g, or raw counts)."""
+        parts = list(self.read_segments(address, t0, t1, calibrated))
+        if not parts:
+            dtype = np.float32 if calibrated else SAMPLE_DTYPE
+            return ArchiveSlice(np.empty(0), np.empty(0, dtype=dtype), None, None, None)
+        if len({(p.sample_rate, p.axes) for p in parts}) > 1:
+            raise ValueError("Sample rate or axes change within the range; use read_segments()")
+        return ArchiveSlice(np.concatenate([p.times for p in parts]), np.concatenate([p.samples for p in parts]),
+                            parts[0].sample_rate, parts[0].axes, parts[-1].calibration)
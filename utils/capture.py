@@ -0,0 +1,180 @@
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .sensor_map import UUID_DATA
+
+DATA_UUID, _ = UUID_DATA["data"]
+
+# File layout: one 64-byte header, then records of RECORD + raw payload bytes
+MAGIC = b"BVCAP\x00"
+VERSION = 1
+HEADER = struct.Struct("<6sH32sHHIBd")  # magic, version, address, calibration, gain, sample_rate Hz, axes, created
+HEADER_SIZE = 64
+RECORD = struct.Struct("<dIH")  # monotonic timestamp, sequence number, payload length
+
+
+def capture_path(directory, address):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{address.replace(':', '')}_{stamp}.bvcap")
+
+
+class CaptureWriter:
+    """Appends raw data notifications of one sensor to a .bvcap file.
+
+    ``record`` only queues the payload; a background thread packs and writes in
+    batches. If the queue is full the record is dropped but its sequence number is
+    still consumed, so readers can see the gap.
+    """
+
+    def __init__(self, path, address, calibration, gain=1, sample_rate=0, axes=1, max_batch=256, max_queue=20000):
+        self.path = path
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._seq = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            header = HEADER.pack(MAGIC, VERSION, address.encode()[:32], int(calibration), int(gain),
+                                 int(sample_rate), int(axes), time.time())
+            self._file.write(header.ljust(HEADER_SIZE, b"\x00"))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, data, timestamp=None):
+        seq = self._seq
+        self._seq += 1
+        try:
+            self._queue.put_nowait((time.monotonic() if timestamp is None else timestamp, seq, bytes(data)))
+        except queue.Full:
+            self.dropped += 1
+
+    def on_notify(self, sender, data):
+        """Notification callback, for recording without the plotting handler."""
+        self.record(data)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            chunks = []
+            for item in batch:
+                if item is None:
+                    running = False
+                    break
+                timestamp, seq, payload = item
+                chunks.append(RECORD.pack(timestamp, seq, len(payload)))
+                chunks.append(payload)
+            self._file.write(b"".join(chunks))
+            if self._queue.empty():
+                self._file.flush()
+        self._file.close()
+
+
+async def start_recording(client, writer):
+    """Subscribe ``writer`` to the data characteristic of a connected client."""
+    await client.start_notify(DATA_UUID, writer.on_notify)
+
+
+class CaptureReader:
+    """Memory-maps a .bvcap file and exposes its records as NumPy views (no copies while payload sizes match)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, address, calibration, gain, sample_rate, axes, created = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a BluVib capture")
+        self.version = version
+        self.address = address.rstrip(b"\x00").decode()
+        self.calibration = calibration
+        self.gain = gain
+        self.sample_rate = sample_rate
+        self.axes = axes
+        self.created = created
+        self._records = None
+
+    def records(self):
+        """Structured array with fields t, seq and length, plus the payloads.
+
+        A sensor sends one payload size, so the records normally form a fixed-stride
+        array over the mapping: then ``payload`` (uint8[L]) is a field of a view and
+        nothing is copied. If sizes differ (a short last notification, a firmware
+        change mid-capture) the records are walked by their length field instead and
+        ``offset`` gives where each payload starts in the file. A trailing partial
+        record (e.g. after a crash) is ignored.
+        """
+        if self._records is None:
+            self._records = self._fixed()
+            if self._records is None:
+                self._records = self._walk()
+        return self._records
+
+    @property
+    def uniform(self):
+        """True if every payload has the same size (``payload`` field and ``raw_samples`` available)."""
+        return "payload" in self.records().dtype.names
+
+    def _fixed(self):
+        body = len(self._map) - HEADER_SIZE
+        length = RECORD.unpack_from(self._map, HEADER_SIZE)[2] if body >= RECORD.size else 0
+        dtype = np.dtype([("t", "<f8"), ("seq", "<u4"), ("length", "<u2"), ("payload", "u1", (length,))])
+        count = body // dtype.itemsize
+        records = np.ndarray((count,), dtype=dtype, buffer=self._map, offset=HEADER_SIZE)
+        if count and not (records["length"] == length).all():
+            return None
+        rest = HEADER_SIZE + count * dtype.itemsize
+        if len(self._map) - rest >= RECORD.size and \
+                rest + RECORD.size + RECORD.unpack_from(self._map, rest)[2] <= len(self._map):
+            return None  # a whole record of another size after the last full-size one
+        return records
+
+    def _walk(self):
+        entries = []
+        position, end = HEADER_SIZE, len(self._map)
+        while position + RECORD.size <= end:
+            t, seq, length = RECORD.unpack_from(self._map, position)
+            if position + RECORD.size + length > end:
+                break
+            entries.append((t, seq, length, position + RECORD.size))
+            position += RECORD.size + length
+        dtype = np.dtype([("t", "<f8"), ("seq", "<u4"), ("length", "<u2"), ("offset", "<i8")])
+        return np.array(entries, dtype=dtype)
+
+    def __len__(self):
+        return len(self.records())
+
+    @property
+    def timestamps(self):
+        return self.records()["t"]
+
+    @property
+    def sequence(self):
+        return self.records()["seq"]
+
+    def raw_samples(self):
+        """(records, values per payload) little-endian uint16 view of the payloads."""
+        if not self.uniform:
+            raise ValueError(f"{self.path} mixes payload sizes; read it with payloads()")
+        return self.records()["payload"].view("<u2")
+
+    def payloads(self):
+        """Payloads as bytes, e.g. for the replay backend."""
+        records = self.records()
+        if self.uniform:
+            return [p.tobytes() for p in records["payload"]]
+        return [self._map[o:o + n].tobytes() for o, n in zip(records["offset"].tolist(), records["length"].tolist())]
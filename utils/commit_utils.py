@@ -1,14 +1,21 @@
 import asyncio
 
-from bleak import BleakClient, BleakScanner
 
 
-async def commit_changes(app, client, address, scan_instance):
-    COMMIT_UUID = "1c930030-d459-11e7-9296-b8e856369374"
-    data = bytes([0x01])
+async def commit_changes(app, address, scan_instance):
+    """Write the staged parameter changes, send one commit and verify with a batched read-back.
+
+    The client is taken from the app's SensorConnection at each step, since the commit
+    itself drops the link and the session comes back with a new client.
+    """
+    transaction = app.transaction
+    expected = transaction.changes()
+    if not expected:
+        print("No staged changes, nothing to commit")
+        return "No changes to save"
 
     print("Starting commit...")
-    client = await ensure_fresh_connection(app, client, address)
+    client = await ensure_fresh_connection(app, address)
     print("Connected to sensor")
 
     app.commit_status_label.after(0, lambda:
@@ -17,16 +24,16 @@ async def commit_changes(app, client, address, scan_instance):
     print('label for Committing...')
 
     try:
-        await asyncio.wait_for(client.write_gatt_char(COMMIT_UUID, data), timeout=5)
+        await transaction.write_changes(client, expected)
+        await transaction.commit(client)
         print("Commit successful")
-        await scan_instance.on_sensor_commit(address)
     except asyncio.TimeoutError:
-        print(f"Write to {COMMIT_UUID} timed out — assuming disconnect.")
-        client = await ensure_fresh_connection(app, client, address)
+        print("Write timed out — assuming disconnect.")
+        client = await ensure_fresh_connection(app, address)
         try:
-            await asyncio.wait_for(client.write_gatt_char(COMMIT_UUID, data), timeout=5)
+            await transaction.write_changes(client, expected)
+            await transaction.commit(client)
             print("Commit successful after reconnect")
-            await scan_instance.on_sensor_commit(address)
         except Exception as e:
             print("Commit failed after reconnect:", e)
             raise e
@@ -34,9 +41,17 @@ async def commit_changes(app, client, address, scan_instance):
         print("Commit failed:", e)
         raise e
 
+    await scan_instance.on_sensor_commit(address)
+    client = app.client
+
+    values, mismatched = await transaction.verify(client, expected)
+    app.root.after(0, lambda: app.show_parameters(values))
+    if mismatched:
+        raise Exception(f"read-back differs for {', '.join(mismatched)}")
+
     print("After commit changes, the client: ", client, "Connected: ", client.is_connected)
 
-    return client
+    return f"Saved {len(expected)} change(s) ✅"
 
 
 def on_commit_button_click(app, address, scan_instance):
@@ -44,16 +59,15 @@ def on_commit_button_click(app, address, scan_instance):
     app.commit_status_label.after(0, lambda:
         app.commit_status_label.config(text="Committing...", fg="green"))
 
-    future = asyncio.run_coroutine_threadsafe(commit_changes(app, app.client, address, scan_instance), app.loop)
+    future = app.dispatcher.submit(commit_changes(app, address, scan_instance))
     future.add_done_callback(lambda fut: _on_commit_done(app, fut))
 
 
 def _on_commit_done(app, future):
     try:
-        new_client = future.result()
-        app.client = new_client
+        message = future.result()
         app.commit_status_label.after(0, lambda:
-            app.commit_status_label.config(text="Commit successful ✅, to Disconnect", fg="green"))
+            app.commit_status_label.config(text=message, fg="green"))
     except Exception as ee:
         app.commit_status_label.after(0, lambda ee=ee:
         app.commit_status_label.config(text=f"Commit failed ❌: {ee}", fg="red"))
@@ -62,37 +76,20 @@ def _on_commit_done(app, future):
         app.commit_status_label.after(3000, lambda: app.commit_status_label.config(text=""))
 
 
-async def ensure_fresh_connection(app, client, address):
-    if not client or not client.is_connected:
-        app.commit_status_label.config(text=f"Reconnecting...", fg="red")  # OK
+async def ensure_fresh_connection(app, address):
+    """The app's current client, reconnecting its SensorConnection first if the link is down."""
+    if not app.sensor_connection.is_connected:
+        app.commit_status_label.after(0, lambda: app.commit_status_label.config(text=f"Reconnecting...", fg="red"))
         print(f"Not Connected to {address}! Trying to reconnect...")
-
-        # Scan for device first
-        devices = await BleakScanner.discover(timeout=20.0)
-        found = any(d.address == address for d in devices)
-        print("Finding devices matching Address...")
-        if not found:
-            app.commit_status_label.config(text=f"Sensor Not Found", fg="red")
-            raise Exception(f"Device with address {address} was not found during scan.")
-        else:
-            print("Found Device with address {address}.")
-
-        if client:
-            try:
-                await client.disconnect()
-            except Exception:
-                pass
-            print("old client disconnected")
-        client = BleakClient(address)
-        try:
-            print("Created New client")
-            await client.connect()
-            app.commit_status_label.config(text=f"Reconnected", fg="green")
-            print(f"Reconnected successfully to {address}.")
-        except Exception as e:
+        # The connection rebuilds its own link (and session), so no second client is left behind
+        await app.sensor_connection.reconnect()
+        if not app.sensor_connection.is_connected:
             print("Fail in Reconnection")
-            app.commit_status_label.config(text=f"Sensor Not Found", fg="red")
-            raise Exception(f"Device {address} not connected and reconnection failed.") from e
+            app.commit_status_label.after(0, lambda: app.commit_status_label.config(text=f"Sensor Not Found",
+                                                                                     fg="red"))
+            raise Exception(f"Device {address} not connected and reconnection failed.")
+        app.commit_status_label.after(0, lambda: app.commit_status_label.config(text=f"Reconnected", fg="green"))
+        print(f"Reconnected successfully to {address}.")
 
-    return client
+    return app.client
 
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class ConnectionOrchestrator:
+    """Brings sensors up in parallel with a cap on concurrent connection attempts.
+
+    Adapters only handle a few simultaneous connects, so at most ``max_concurrent``
+    sensors are in bring-up at once; each one gets ``timeout`` seconds once it starts.
+    Stage durations end up in ``timings[address]``.
+    """
+
+    def __init__(self, max_concurrent=3, timeout=20.0):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.timings = {}  # address -> {stage: seconds}
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Created lazily so it belongs to the loop that runs the bring-up
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def stage(self, address, name):
+        """Time one bring-up stage, e.g. ``async with orchestrator.stage(addr, "mode"):``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.setdefault(address, {})[name] = time.perf_counter() - start
+
+    async def _bring_up(self, sensor_conn, setup):
+        address = sensor_conn.address
+        async with self.stage(address, "connect"):
+            await sensor_conn.connect()
+        if not sensor_conn.is_connected:
+            raise ConnectionError(f"{address} did not connect")
+        await sensor_conn.start_session(setup)
+
+    async def bring_up(self, sensor_conn, setup):
+        """Connect one sensor and run its session setup; returns True on success."""
+        address = sensor_conn.address
+        self.timings[address] = {}
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._bring_up(sensor_conn, setup), timeout=self.timeout)
+                ok = True
+            except asyncio.TimeoutError:
+                print(f"Bring-up of {address} timed out after {self.timeout}s")
+                ok = False
+            except Exception as e:
+                print(f"Bring-up of {address} failed: {e}")
+                ok = False
+            self.timings[address]["total"] = time.perf_counter() - start
+        if not ok:
+            await sensor_conn.disconnect()
+        self.report(address)
+        return ok
+
+    async def bring_up_all(self, connections, setup):
+        """Bring up every SensorConnection in ``connections`` concurrently."""
+        return await asyncio.gather(*(self.bring_up(conn, setup) for conn in connections))
+
+    def report(self, address):
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.get(address, {}).items())
+        print(f"Bring-up {address}: {stages}")
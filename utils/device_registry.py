@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+from . import transport
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "known_devices.json")
+
+
+class DeviceRegistry:
+    """Sensors we have seen before, persisted as JSON.
+
+    Each entry keeps name, last calibration, last parameters and when it was last
+    connected. The last ``BLEDevice`` handle only lives in memory (it cannot be
+    serialised) and lets ``connect`` skip the pre-connect scan.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.devices = {}  # address -> {"name", "calibration", "params", "last_connected"}
+        self._handles = {}  # address -> BLEDevice from the latest advertisement
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.devices = json.load(f)
+        except FileNotFoundError:
+            self.devices = {}
+        except (OSError, ValueError) as e:
+            print(f"Could not load device registry {self.path}: {e}")
+            self.devices = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.devices, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save device registry {self.path}: {e}")
+
+    def get(self, address):
+        return self.devices.get(address)
+
+    def handle(self, address):
+        return self._handles.get(address)
+
+    def remember(self, address, name=None, device=None, calibration=None, params=None):
+        """Record what we know about a sensor; only writes the file when a stored field changes."""
+        if device is not None:
+            self._handles[address] = device
+        changed = address not in self.devices
+        entry = self.devices.setdefault(address, {"name": None, "calibration": None, "params": {}})
+        if name and entry.get("name") != name:
+            entry["name"] = name
+            changed = True
+        if calibration is not None and entry.get("calibration") != calibration:
+            entry["calibration"] = calibration
+            changed = True
+        if params:
+            merged = dict(entry.get("params") or {}, **params)
+            if merged != entry.get("params"):
+                entry["params"] = merged
+                changed = True
+        if changed:
+            self.save()
+
+    def mark_connected(self, address):
+        self.devices.setdefault(address, {"name": None, "calibration": None, "params": {}})
+        self.devices[address]["last_connected"] = time.time()
+        self.save()
+
+    async def connect(self, address, direct_timeout=4.0, scan_timeout=10.0, disconnected_callback=None):
+        """Return a connected BleakClient: direct connect first, scan only when that fails."""
+        target = self._handles.get(address, address)
+        client = transport.BleakClient(target, disconnected_callback=disconnected_callback, timeout=direct_timeout)
+        try:
+            await client.connect()
+            self.mark_connected(address)
+            return client
+        except Exception as e:
+            print(f"Direct connect to {address} failed ({e}), scanning...")
+
+        device = await transport.BleakScanner.find_device_by_address(address, timeout=scan_timeout)
+        if device is None:
+            raise Exception(f"Device with address {address} was not found during scan.")
+        self._handles[address] = device
+        client = transport.BleakClient(device, disconnected_callback=disconnected_callback)
+        await client.connect()
+        self.mark_connected(address)
+        return client
@@ -1,15 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
-from bleak import BleakScanner, BleakClient
-import threading
+from . import transport
 import asyncio
 from .sensor_map import MAPPINGS, UUID_MAP_BUTTON, UUID_MAP
+from .param_reader import decode_param
 
 
 class BLEParameterEditor:
-    def __init__(self, parent, client, param_key, param_raw_values, param_final_values, loop, label=None):
-        self.loop = loop
-        self.client = client
+    def __init__(self, parent, client, param_key, param_raw_values, param_final_values, dispatcher, label=None,
+                 auto_read=True, param_cache=None, transaction=None, registry=None):
+        self.dispatcher = dispatcher
+        self.param_cache = param_cache
+        self.transaction = transaction  # when set, selections are staged instead of written
+        self.registry = registry
+        self.loop = dispatcher.loop
+        self.connection = client  # a BleakClient, or a SensorConnection (its current client is used per call)
         self.address = client.address
         self.param_key = param_key
         self.param_raw_values = param_raw_values
@@ -45,11 +50,21 @@ class BLEParameterEditor:
 
         self.widget["state"] = "disabled"
 
-        # Start reading in a thread to avoid blocking Tkinter
-        threading.Thread(target=self.read_value, daemon=True).start()
+        # Read on the GATT loop to avoid blocking Tkinter; a batch reader may fill us instead
+        if auto_read:
+            self.read_value()
+
+    @property
+    def client(self):
+        # A SensorConnection hands out the client of its current link, which a reconnect replaces
+        return self.connection.get_client() if hasattr(self.connection, "get_client") else self.connection
+
+    @client.setter
+    def client(self, client):
+        self.connection = client
 
     def read_value(self):
-        asyncio.run(self._async_read_value())
+        return self.dispatcher.submit(self._async_read_value())
 
     async def _async_read_value(self):
         try:
@@ -57,35 +72,53 @@ class BLEParameterEditor:
             self.uuid = uuid_str
 
             value_bytes = await self.client.read_gatt_char(self.uuid)
-            raw_val = int.from_bytes(value_bytes, byteorder="little")
-
-            self.param_raw_values[self.param_key] = raw_val
-
-            if self.mapping:
-                value_dict = dict(self.mapping)
-                label = value_dict.get(raw_val, "Unknown")
-            else:
-                label = str(raw_val)
-            self.param_final_values[self.param_key] = label
-            # print("Debug: final:", self.param_final_values)
-            if self.param_key == "trigger_delay":
-                label = int(self.param_final_values["trigger_delay"])  # TODO ask Jim about its definiction
-
+            value = decode_param(self.param_key, value_bytes)
+            if self.param_cache:
+                self.param_cache.put(self.address, self.param_key, value)
             # Update GUI in main thread
-            self.frame.after(0, lambda: self.update_ui(label))
+            self.frame.after(0, lambda: self.apply_value(*value))
         except Exception as e:
             print(self.param_raw_values)
             print(f"Failed to read {self.param_key}:", e)
             self.frame.after(0, lambda: self.status.set("Read failed"))
 
+    def apply_value(self, raw_val, label):
+        """Show a value read from the sensor (by this editor or by a batch read). Tk thread only."""
+        self.param_raw_values[self.param_key] = raw_val
+        self.param_final_values[self.param_key] = label
+        # print("Debug: final:", self.param_final_values)
+        if self.param_key == "trigger_delay":
+            label = int(self.param_final_values["trigger_delay"])  # TODO ask Jim about its definiction
+        self.update_ui(label)
+
     def update_ui(self, label):
         self.selected_value.set(label)
         self.widget["state"] = "readonly" if self.mapping else "normal"
         self.status.set("Fetched")
 
     def on_value_selected_sync(self, event=None):
-        # schedule the async method on the running loop
-        asyncio.run_coroutine_threadsafe(self.on_value_selected(event), self.loop)
+        if self.transaction is not None:
+            self.stage_value()
+            return
+        # schedule the async method on the GATT loop
+        self.dispatcher.submit(self.on_value_selected(event))
+
+    def stage_value(self):
+        """Stage the selected value in the transaction; it is written on SAVE."""
+        label = self.selected_value.get()
+        try:
+            if self.mapping:
+                raw_val = next(val for val, lbl in self.mapping if lbl == label)
+            else:
+                raw_val = int(label)
+        except (StopIteration, ValueError):
+            self.status.set("Invalid value")
+            return
+        self.transaction.stage(self.param_key, raw_val)
+        if self.param_key in self.transaction.changes():
+            self.status.set(f"Staged {label}")
+        else:
+            self.status.set("Unchanged")
         # asyncio.create_task(self.on_value_selected(event), self.loop)
 
     # async def on_value_selected(self, event=None):
@@ -112,14 +145,14 @@ class BLEParameterEditor:
     #     print("22")
 
     async def on_value_selected(self, event=None):
-        self.client = await self.reconnect()
+        await self.reconnect()
         try:
             await self.write_value_with_timeout()
             print("Write completed successfully")
 
         except asyncio.TimeoutError:
             print("Write timed out — assuming disconnect.")
-            self.client = await self.reconnect()
+            await self.reconnect()
             try:
                 await self.write_value_with_timeout()
                 print("Write to Variant successful after reconnect")
@@ -136,26 +169,26 @@ class BLEParameterEditor:
             print("Not Connected! Trying to reconnect...")
             self.frame.after(0, lambda: self.status.set(f"Reconnecting..."))
 
-            print("Setting Label")
-            devices = await BleakScanner.discover(timeout=5.0)
-            found = any(d.address == self.address for d in devices)
-            print("Looking for device matching Address")
-            if not found:
-                self.frame.after(0, lambda: self.status.set(f"Sensor Not Found..."))
-                raise Exception(f"Device with address {self.address} was not found during scan.")
-            print("Before disconnection")
             try:
+                if hasattr(self.connection, "reconnect"):
+                    # The SensorConnection rebuilds its own link, and re-subscribes
+                    await self.connection.reconnect()
+                    if not self.client or not self.client.is_connected:
+                        raise ConnectionError("session not restored")
+                    self.frame.after(0, lambda: self.status.set(f"Reconnected"))
+                    return self.client
                 # If client exists, disconnect first to clean up
                 if self.client:
                     try:
                         await self.client.disconnect()
                     except Exception:
                         pass
-                # Create new client instance if needed
-                print("After disconnection")
-                self.client = BleakClient(self.address)
-                print("Creating new Client")
-                await self.client.connect()
+                # Direct connect to the known device; the registry only scans if that fails
+                if self.registry:
+                    self.client = await self.registry.connect(self.address)
+                else:
+                    self.client = transport.BleakClient(self.address)
+                    await self.client.connect()
                 self.frame.after(0, lambda: self.status.set(f"Reconnected"))
                 print(f"Value Selected: Reconnected successfully to {self.address}.")
             except Exception as e:
@@ -177,6 +210,9 @@ class BLEParameterEditor:
 
             data = raw_val.to_bytes(byte_size, byteorder="little")  # Adjust byte size if needed
             await self.client.write_gatt_char(self.uuid, data)
+            if self.param_cache:
+                # Write-through: the sensor now holds what we just wrote
+                self.param_cache.put(self.address, self.param_key, (raw_val, label if self.mapping else str(raw_val)))
 
             # Show human decimal label (from UI) and raw bytes sent (in hex)
             self.frame.after(0, lambda: self.status.set(f"Wrote {label} (bytes: {data.hex()})"))
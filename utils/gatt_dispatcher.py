@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+
+class GattDispatcher:
+    """One asyncio loop, on one background thread, that owns every BleakClient.
+
+    UI code never runs bleak itself: it submits coroutines here and gets back a
+    ``concurrent.futures.Future`` (``run_coroutine_threadsafe`` semantics), so no
+    thread or event loop is created per GATT operation.
+    """
+
+    def __init__(self, loop=None):
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=self._run_loop, args=(loop,), daemon=True).start()
+        self.loop = loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the GATT loop and return its concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def read(self, target, uuid):
+        """Read a characteristic; ``target`` is a BleakClient or a SensorConnection."""
+        return self.submit(self._read(target, uuid))
+
+    def write(self, target, uuid, data):
+        """Write a characteristic; ``target`` is a BleakClient or a SensorConnection."""
+        return self.submit(self._write(target, uuid, data))
+
+    @staticmethod
+    def _resolve(target):
+        # Unwrap at execution time so a SensorConnection that reconnected hands out its new client
+        return target.get_client() if hasattr(target, "get_client") else target
+
+    async def _read(self, target, uuid):
+        return await self._resolve(target).read_gatt_char(uuid)
+
+    async def _write(self, target, uuid, data):
+        return await self._resolve(target).write_gatt_char(uuid, data)
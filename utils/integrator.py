@@ -0,0 +1,121 @@
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+from .spectral import G, mapped
+
+MM_PER_S2_PER_G = G * 1000.0
+
+
+class _HighPass:
+    """Butterworth high-pass over (n, axes) blocks that carries its state (zi) between calls."""
+
+    def __init__(self, cutoff, sample_rate, order):
+        self.sos = butter(order, cutoff, btype="highpass", fs=sample_rate, output="sos")
+        self.zi = None
+
+    def __call__(self, block):
+        if self.zi is None:
+            # Start as if the first value had always been there: no step transient
+            self.zi = sosfilt_zi(self.sos)[:, :, None] * block[0][None, None, :]
+        out, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+        return out
+
+
+class _Trapezoid:
+    """Running trapezoidal integral over (n, axes) blocks."""
+
+    def __init__(self, dt):
+        self.dt = dt
+        self.last_input = None
+        self.total = None
+
+    def __call__(self, block):
+        if self.last_input is None:
+            self.last_input = block[0]
+            self.total = np.zeros(block.shape[1])
+        previous = np.concatenate([self.last_input[None, :], block[:-1]])
+        out = np.cumsum((previous + block) * (self.dt / 2), axis=0)
+        out += self.total
+        self.last_input = block[-1]
+        self.total = out[-1]
+        return out
+
+
+class StreamIntegrator:
+    """Acceleration (g) to velocity (mm/s) and displacement (um) at the full sample rate.
+
+    Each stage is high-passed: acceleration before integrating (offset and
+    gravity), and velocity and displacement after (integration drift), with
+    filter state and integrals carried from one notification to the next.
+    Notifications need not end on frame boundaries: interleaved values are fed
+    as they arrive and a partial frame is kept for the next call. Values are
+    collected until ``min_frames`` frames are ready, since the filters cost about
+    the same per call for 20 or 2000 frames.
+    """
+
+    def __init__(self, sample_rate=25600, axes=1, cutoff=10.0, order=2, min_frames=256):
+        self.sample_rate = sample_rate
+        self.axes = max(int(axes), 1)
+        self.cutoff = cutoff
+        dt = 1.0 / sample_rate
+        self._acc_filter = _HighPass(cutoff, sample_rate, order)
+        self._velocity = _Trapezoid(dt)
+        self._vel_filter = _HighPass(cutoff, sample_rate, order)
+        self._displacement = _Trapezoid(dt)
+        self._disp_filter = _HighPass(cutoff, sample_rate, order)
+        self.min_frames = min_frames
+        # Values not integrated yet, copied in (callers may reuse their arrays)
+        self._pending = np.empty(2 * min_frames * self.axes, dtype=np.float32)
+        self._pending_size = 0
+        self.velocity = np.empty((0, self.axes))      # mm/s of the last block, per axis
+        self.displacement = np.empty((0, self.axes))  # um of the last block, per axis
+
+    @classmethod
+    def from_params(cls, params, **kwargs):
+        """Build from raw register values (as read from the sensor): sample_rate and axes."""
+        return cls(sample_rate=mapped("sample_rate", params.get("sample_rate"), 25600),
+                   axes=mapped("axes", params.get("axes"), 1), **kwargs)
+
+    def reset(self):
+        """Start the filters and integrals afresh, e.g. after a break in the stream (a partial frame is kept)."""
+        for stage in (self._acc_filter, self._vel_filter, self._disp_filter):
+            stage.zi = None
+        for stage in (self._velocity, self._displacement):
+            stage.last_input = stage.total = None
+
+    def feed(self, values):
+        """Add ``values`` (g, interleaved); returns the (velocity, displacement) blocks integrated by this call.
+
+        The blocks are empty until ``min_frames`` frames have been collected.
+        """
+        size = self._pending_size + len(values)
+        if size > len(self._pending):
+            self._pending = np.resize(self._pending, 2 * size)  # a long block (filled gap)
+        self._pending[self._pending_size:size] = values
+        self._pending_size = size
+        if size < self.min_frames * self.axes:
+            return np.empty((0, self.axes)), np.empty((0, self.axes))
+        usable = size // self.axes * self.axes
+        result = self.process(self._pending[:usable].reshape(-1, self.axes))
+        self._pending[:size - usable] = self._pending[usable:size]
+        self._pending_size = size - usable
+        return result
+
+    def process(self, frames):
+        """Integrate an (n, axes) block of g values."""
+        acc = self._acc_filter(frames * MM_PER_S2_PER_G)
+        self.velocity = self._vel_filter(self._velocity(acc))
+        self.displacement = self._disp_filter(self._displacement(self.velocity)) * 1000.0
+        return self.velocity, self.displacement
+
+    def velocity_rms(self, per_axis=False):
+        """RMS over the last block (mm/s), the usual vibration-severity figure.
+
+        Combined over all axes, or with ``per_axis`` one value per axis (all axes in one reduction).
+        """
+        if not self.velocity.size:
+            return np.zeros(self.axes) if per_axis else 0.0
+        mean_square = np.mean(np.square(self.velocity), axis=0)
+        if per_axis:
+            return np.sqrt(mean_square)
+        return float(np.sqrt(mean_square.sum()))
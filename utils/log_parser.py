@@ -0,0 +1,130 @@
+import re
+
+import numpy as np
+
+from .decoder import SAMPLE_DTYPE, ZERO_G_OFFSET
+
+# Patterns of the console dumps written by old/connect.py and old/keep_connect.py
+CONNECT_RE = re.compile(r"Connecting to ([0-9A-Fa-f:]{17})")
+CALIBRATION_RE = re.compile(r"Calibration: (\d+)")
+GAIN_RE = re.compile(r"Gain: (\d+)")
+FACTOR_RE = re.compile(r"Conversion Factor: ([0-9.eE+-]+)")
+BLOCK_RE = re.compile(r"Notification from \S+ \(Handle: \d+\): Unknown \((\d+) values\):")
+INLINE_RE = re.compile(r"Notification from \S+ \(Handle: \d+\): Unknown: \[(.*)\]")
+SAMPLE_RATE_WRITTEN = "Sample rate written."  # old/connect.py always writes 0x01
+HEADER_PATTERNS = (("address", CONNECT_RE, str), ("calibration", CALIBRATION_RE, int),
+                   ("gain", GAIN_RE, int), ("factor", FACTOR_RE, float))
+
+
+def new_header():
+    return {"address": None, "calibration": None, "gain": None, "factor": None, "sample_rate": None}
+
+
+def encode_counts(printed, factor):
+    """Printed values back to the raw uint16 samples the sensor sent (to printed precision)."""
+    counts = printed / factor
+    return np.clip(np.rint(counts) + ZERO_G_OFFSET, 0, 65535).astype(SAMPLE_DTYPE)
+
+
+def iter_log_batches(lines, header=None, batch=512):
+    """Stream (header, raw uint16 samples, values per notification) for batches of notifications.
+
+    ``lines`` is any iterable of text lines (an open file is read lazily). ``header``
+    is updated in place from the connect / gain / calibration lines; a batch is always
+    yielded before the header changes, so it describes every sample in the batch.
+    Block dumps (old/connect.py) print g with the header's conversion factor; inline
+    ``[...]`` dumps (old/keep_connect.py) were printed with a factor of 1, i.e. in counts.
+    Value text is collected and parsed with one ``np.fromstring`` call per batch.
+    """
+    header = new_header() if header is None else header
+    pending = 0
+    block = []
+    texts = []
+    sizes = []
+    batch_factor = None
+
+    def flush():
+        raw = encode_counts(np.fromstring(",".join(texts), sep=","), batch_factor)
+        texts.clear()
+        result = (header, raw, list(sizes))
+        sizes.clear()
+        return result
+
+    def add(text, size, factor):
+        # Returns a full batch to yield, if adding this notification closed one
+        nonlocal batch_factor
+        out = flush() if texts and factor != batch_factor else None
+        batch_factor = factor
+        texts.append(text)
+        sizes.append(size)
+        return out
+
+    def finish_block():
+        # A row ending in "," or a short count means the block was cut short
+        # (e.g. the process exited mid-print): drop it
+        if block and not block[-1].endswith(","):
+            text = ",".join(block)
+            if text.count(",") + 1 == pending:
+                return add(text, pending, header["factor"] or 1.0)
+        return None
+
+    for line in lines:
+        if pending:
+            if line.startswith(" "):
+                row = line.strip()
+                if row:
+                    block.append(row)
+                    continue
+            full = finish_block()
+            pending, block = 0, []
+            if full:
+                yield full
+        if len(texts) >= batch:
+            yield flush()
+        if not line.startswith("Notification"):
+            if texts:
+                yield flush()
+            if line.startswith(SAMPLE_RATE_WRITTEN):
+                header["sample_rate"] = 25600
+                continue
+            for key, pattern, cast in HEADER_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    if key == "address" and header["address"] not in (None, match.group(1)):
+                        # A different sensor further down the file: its settings are unknown again
+                        header.update(new_header())
+                    header[key] = cast(match.group(1))
+            continue
+        match = BLOCK_RE.match(line)
+        if match:
+            pending = int(match.group(1))
+            continue
+        match = INLINE_RE.match(line)
+        if match and match.group(1):
+            text = match.group(1)
+            full = add(text, text.count(",") + 1, 1.0)
+            if full:
+                yield full
+    if pending:
+        full = finish_block()
+        if full:
+            yield full
+    if texts:
+        yield flush()
+
+
+def iter_log(lines, header=None):
+    """Stream (header, raw uint16 samples) for every complete notification in a console dump."""
+    for header, raw, sizes in iter_log_batches(lines, header):
+        start = 0
+        for size in sizes:
+            yield header, raw[start:start + size]
+            start += size
+
+
+def read_log(path):
+    """Parse a whole console dump into (header, payloads as raw bytes)."""
+    header = new_header()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        payloads = [raw.tobytes() for _, raw in iter_log(f, header)]
+    return header, payloads
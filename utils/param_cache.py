@@ -0,0 +1,71 @@
+import time
+
+from .param_reader import read_params
+
+# Seconds a cached value stays valid; configuration registers only change when we write them
+DEFAULT_TTL = 600.0
+DEFAULT_TTLS = {
+    "temp": 30.0,
+    "battery": 300.0,
+    "time": 0.0,  # the sensor clock is always read fresh
+}
+
+
+class ParamCache:
+    """Decoded parameter values keyed by (address, param), each with its own TTL.
+
+    Writes and commits go through ``put`` so the cache always holds what was last
+    written; ``invalidate`` drops a sensor's entries after a factory reset,
+    restart or power-off.
+    """
+
+    def __init__(self, default_ttl=DEFAULT_TTL, ttls=None, clock=time.monotonic):
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.clock = clock
+        self._entries = {}  # (address, param) -> (value, stored_at)
+
+    def ttl(self, param):
+        return self.ttls.get(param, self.default_ttl)
+
+    def get(self, address, param, max_age=None):
+        """Return the cached (raw, label) or None if missing or older than its TTL/max_age."""
+        entry = self._entries.get((address, param))
+        if entry is None:
+            return None
+        value, stored_at = entry
+        limit = self.ttl(param) if max_age is None else min(max_age, self.ttl(param))
+        if self.clock() - stored_at > limit:
+            return None
+        return value
+
+    def put(self, address, param, value):
+        self._entries[(address, param)] = (value, self.clock())
+
+    def invalidate(self, address, param=None):
+        """Forget one parameter, or every parameter of ``address`` when ``param`` is None."""
+        if param is not None:
+            self._entries.pop((address, param), None)
+            return
+        for key in [k for k in self._entries if k[0] == address]:
+            del self._entries[key]
+
+    async def get_or_read(self, client, address, keys, fresh=False, max_concurrent=4):
+        """Return {key: (raw, label)}, reading only the keys that are not cached (or all if ``fresh``).
+
+        Failed reads are returned as exceptions and are not cached.
+        """
+        values = {}
+        if not fresh:
+            for key in keys:
+                cached = self.get(address, key)
+                if cached is not None:
+                    values[key] = cached
+        missing = [key for key in keys if key not in values]
+        if missing:
+            fetched = await read_params(client, missing, max_concurrent=max_concurrent)
+            for key, value in fetched.items():
+                if not isinstance(value, Exception):
+                    self.put(address, key, value)
+            values.update(fetched)
+        return values
@@ -0,0 +1,54 @@
+import asyncio
+
+from .sensor_map import UUID_MAP, UUID_DATA, MAPPINGS
+
+# Notify-only characteristics are streamed, never read
+STREAM_KEYS = ("data",)
+# Registers that hold signed values (see show_battery_temp.read_int_value)
+SIGNED_KEYS = ("temp", "battery")
+# Registers that are kept as raw bytes
+BYTES_KEYS = ("time",)
+
+
+def param_uuids(keys=None):
+    """Return {uuid: [keys]} for every readable parameter; keys sharing a characteristic are grouped."""
+    table = {key: uuid for key, (uuid, _) in {**UUID_DATA, **UUID_MAP}.items() if key not in STREAM_KEYS}
+    by_uuid = {}
+    for key in (table if keys is None else keys):
+        by_uuid.setdefault(table[key], []).append(key)
+    return by_uuid
+
+
+def decode_param(key, value_bytes):
+    """Decode one register into (raw, label), using MAPPINGS where one exists."""
+    if key in BYTES_KEYS:
+        return bytes(value_bytes), bytes(value_bytes).hex()
+    raw_val = int.from_bytes(value_bytes, byteorder="little", signed=key in SIGNED_KEYS)
+    mapping = MAPPINGS.get(key, None)
+    if mapping:
+        return raw_val, dict(mapping).get(raw_val, "Unknown")
+    return raw_val, str(raw_val)
+
+
+async def read_params(client, keys=None, max_concurrent=4):
+    """Read parameters over one connection with at most ``max_concurrent`` reads in flight.
+
+    Each characteristic is read once. Returns {key: (raw, label)}; a parameter that
+    failed to read maps to the exception instead.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def read_one(uuid, group):
+        async with semaphore:
+            try:
+                value_bytes = await client.read_gatt_char(uuid)
+            except Exception as e:
+                print(f"Failed to read {', '.join(group)}:", e)
+                return {key: e for key in group}
+        return {key: decode_param(key, value_bytes) for key in group}
+
+    results = await asyncio.gather(*(read_one(uuid, group) for uuid, group in param_uuids(keys).items()))
+    values = {}
+    for result in results:
+        values.update(result)
+    return values
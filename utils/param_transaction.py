@@ -0,0 +1,88 @@
+import asyncio
+
+from .sensor_map import UUID_MAP, UUID_MAP_BUTTON, MAPPINGS
+
+COMMIT_UUID = UUID_MAP_BUTTON["release"]
+
+
+def label_for(key, raw_val):
+    mapping = MAPPINGS.get(key, None)
+    if mapping:
+        return dict(mapping).get(raw_val, "Unknown")
+    return str(raw_val)
+
+
+class ParamTransaction:
+    """Parameter edits for one sensor, staged locally and applied together.
+
+    Only values that differ from what the sensor holds (per the parameter cache,
+    falling back to ``baseline``) are written, back to back on one connection,
+    followed by a single commit and a batched read-back. The cache only learns
+    the new values from that read-back; if a write or the commit fails, the
+    written keys are dropped from it, since what the sensor holds is unknown.
+    """
+
+    def __init__(self, address, param_cache, baseline=None):
+        self.address = address
+        self.param_cache = param_cache
+        self.baseline = baseline if baseline is not None else {}  # key -> raw value last read
+        self.staged = {}  # key -> raw value
+        self.written = []  # keys written since the last commit
+
+    def stage(self, key, raw_val):
+        self.staged[key] = raw_val
+
+    def discard(self, key=None):
+        if key is None:
+            self.staged.clear()
+        else:
+            self.staged.pop(key, None)
+
+    def device_value(self, key):
+        cached = self.param_cache.get(self.address, key)
+        return cached[0] if cached is not None else self.baseline.get(key)
+
+    def changes(self):
+        """Return {key: raw} for staged values that differ from the device."""
+        return {key: raw for key, raw in self.staged.items() if raw != self.device_value(key)}
+
+    async def write_changes(self, client, changes=None, timeout=5):
+        """Write ``changes`` (default: every changed value) on ``client``; returns the keys written."""
+        if changes is None:
+            changes = self.changes()
+        for key, raw_val in changes.items():
+            uuid, byte_size = UUID_MAP[key]
+            data = raw_val.to_bytes(byte_size, byteorder="little")
+            self.written.append(key)
+            try:
+                await asyncio.wait_for(client.write_gatt_char(uuid, data), timeout=timeout)
+            except BaseException:
+                self.invalidate_written()
+                raise
+            print(f"Wrote {raw_val} ({label_for(key, raw_val)}) to {key} as bytes: {data.hex()}")
+        return list(changes)
+
+    async def commit(self, client, timeout=5):
+        try:
+            await asyncio.wait_for(client.write_gatt_char(COMMIT_UUID, bytes([0x01])), timeout=timeout)
+        except BaseException:
+            self.invalidate_written()
+            raise
+        self.written.clear()
+
+    def invalidate_written(self):
+        """Drop the written keys from the cache: the sensor may or may not hold the new values."""
+        for key in self.written:
+            self.param_cache.invalidate(self.address, key)
+        self.written.clear()
+
+    async def verify(self, client, expected):
+        """Re-read every parameter in one batch (cached as read); returns ({key: (raw, label)}, [mismatched keys])."""
+        values = await self.param_cache.get_or_read(client, self.address, list(UUID_MAP), fresh=True)
+        mismatched = [key for key, raw_val in expected.items()
+                      if not isinstance(values.get(key), tuple) or values[key][0] != raw_val]
+        # Anything the sensor now reports as staged is settled
+        for key in list(self.staged):
+            if isinstance(values.get(key), tuple) and values[key][0] == self.staged[key]:
+                del self.staged[key]
+        return values, mismatched
@@ -2,150 +2,403 @@ import asyncio
 import numpy as np
 
 from .sensor_map import UUID_DATA
+from .decoder import Decoder, deinterleave
+from .ring_buffer import SensorRingBuffer
+from .spectral import SpectralEngine, WelchAverager, mapped
+from .stream_stats import StreamStats, fill_gaps
+from .trace_assembler import TraceAssembler
+from .integrator import StreamIntegrator
+from .timebase import Timebase
 import time
 
 # Replace with your actual UUIDs
 DATA_UUID, data_size = UUID_DATA["data"]
 calb_uuid, calb_size = UUID_DATA["calibration"]
 
-def update_plot_display(info, canvas, ax_acc_time, ax_vel_time, ax_acc_freq, ax_vel_freq, max_points=200):
-    # print("Total Notification:", len(info["data"]))
-    # Limit data size
-    # plot_data = info["data"]
-    plot_data = info["data"][-max_points:]
-
-    # Extract data
-    timestamps = [d["timestamp"] for d in plot_data]
-    acc_means = [d["acc_mean"] for d in plot_data]
-    velocity = [d.get("velocity", 0) for d in info["data"]]
-
-    # --- Acceleration vs Time ---
-    ax_acc_time.clear()
-    ax_acc_time.plot(timestamps, acc_means, color="blue", label="Acceleration")
-    ax_acc_time.set_title("Acceleration vs Time")
-    ax_acc_time.set_xlabel("Time (s)")
-    ax_acc_time.set_ylabel("Acceleration")
-    ax_acc_time.legend()
-
-    # --- Velocity vs Time ---
-    ax_vel_time.clear()
-    ax_vel_time.plot(timestamps, velocity, color="red", label="Velocity")
-    ax_vel_time.set_title("Velocity vs Time")
-    ax_vel_time.set_xlabel("Time (s)")
-    ax_vel_time.set_ylabel("Velocity")
-    ax_vel_time.legend()
-
-    # def plot_fft_async(ax, data, time_data, title, color="green"):
-    #     def update(freqs, fft_vals):
-    #         ax.clear()
-    #         ax.plot(freqs, fft_vals, color=color)
-    #         ax.set_title(title)
-    #         ax.set_xlabel("Frequency (Hz)")
-    #         ax.set_ylabel("Magnitude")
-    #         ax.figure.canvas.draw_idle()
-    #
-    #     compute_fft_async(data, time_data, update)
-
-
-    # Helper function for FFT plot
-    def plot_fft(ax, data, time_data, title, color="green"):
-        ax.clear()
-        n = len(data)
-        if n > 1:
-            dt_arr = np.diff(time_data)
-            dt = np.mean(dt_arr[dt_arr > 0]) if np.any(dt_arr > 0) else 1e-6
-            freqs = np.fft.rfftfreq(n, d=dt)
-            fft_vals = np.abs(np.fft.rfft(data))
-            ax.plot(freqs, fft_vals, color=color)
+AXIS_COLORS = (("X", "green"), ("Y", "orange"), ("Z", "purple"))
+
+
+def stream_spectra(engine, values, end_index):
+    """Acceleration (g) and velocity (mm/s) amplitude spectra per axis, or None if too few samples."""
+    freqs, acc = engine.spectrum(values, end_index)
+    if freqs is None:
+        return None
+    return freqs, acc, engine.velocity_spectrum(freqs, acc)
+
+
+def welch_spectra(averager, values, end_index):
+    """Fold the new samples into a WelchAverager; acceleration (g^2/Hz) and velocity ((mm/s)^2/Hz) PSDs."""
+    averager.feed(values, end_index)
+    freqs, psd = averager.result()
+    if freqs is None:
+        return None
+    return freqs, psd, averager.velocity_psd(freqs, psd)
+
+
+class PlotRenderer:
+    """Incremental renderer for the four plots of a device window.
+
+    Lines, titles, labels and legends are created once. Each frame only updates
+    line data and blits the four axes onto a cached background; a full redraw
+    happens only when an axis has to be rescaled (or Tk resized the canvas).
+    Time is plotted relative to the newest sample so the x limits stay put.
+
+    Every plot has one line per sensor axis (X, Y, Z). The time plots show the
+    per-notification means; the spectra come from the raw samples, with the
+    sensor's sample rate and axes from ``info["stream"]``. With a ``spectral_worker`` the FFTs run off the Tk thread and each frame shows the
+    newest spectra that have arrived. ``spectrum_mode`` "fft" shows the amplitude
+    spectrum of the newest block; "linear", "exponential" and "peak" show a
+    streaming Welch PSD with that averaging.
+    """
+
+    def __init__(self, canvas, ax_acc_time, ax_vel_time, ax_acc_freq, ax_vel_freq, max_points=200, interval=200,
+                 spectral_worker=None, n_fft=None, window_name="Hann", spectrum_mode="fft", overlap=0.5,
+                 averages=16):
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.spectral_worker = spectral_worker
+        self.max_points = max_points
+        self.interval = interval
+        self.n_fft = n_fft  # None: the sensor's trace length
+        self.window_name = window_name
+        self.spectrum_mode = spectrum_mode
+        self.overlap = overlap
+        self.averages = averages
+        self.engine = None
+        self.averager = None  # WelchAverager when spectrum_mode is not "fft"
+        self._engine_key = None
+        self.spectra = None  # newest (freqs, acc, vel) from stream_spectra
+        self.background = None
+        self.frame_ms = 0.0  # time spent in the last update(), for profiling
+        self.redraws = 0     # full redraws caused by rescaling
+        self.groups = []     # (ax, [lines]) in drawing order
+        for ax, title, xlabel, ylabel, series in (
+                (ax_acc_time, "Acceleration vs Time", "Time (s, 0 = newest)", "Mean acceleration (g)", AXIS_COLORS),
+                (ax_vel_time, "Velocity vs Time", "Time (s, 0 = newest)", "Velocity RMS (mm/s)", AXIS_COLORS),
+                (ax_acc_freq, "Acceleration Frequency Spectrum", "Frequency (Hz)", "Amplitude (g)", AXIS_COLORS),
+                (ax_vel_freq, "Velocity Frequency Spectrum", "Frequency (Hz)", "Amplitude (mm/s)", AXIS_COLORS)):
+            ax.clear()
+            lines = [ax.plot([], [], color=color, label=label, animated=True)[0] for label, color in series]
             ax.set_title(title)
-            ax.set_xlabel("Frequency (Hz)")
-            ax.set_ylabel("Magnitude")
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.legend(loc="upper right")
+            self.groups.append((ax, lines))
+        self.notes = [ax.text(0.5, 0.5, "Not enough data for FFT", ha="center", va="center",
+                              transform=ax.transAxes, animated=True) for ax in (ax_acc_freq, ax_vel_freq)]
+        self._draw_cid = canvas.mpl_connect("draw_event", self._on_draw)
+        self.canvas.draw()
+
+    def _draw_artists(self):
+        for ax, lines in self.groups:
+            for line in lines:
+                if line.get_visible():
+                    ax.draw_artist(line)
+        for note in self.notes:
+            if note.get_visible():
+                note.axes.draw_artist(note)
+
+    def _on_draw(self, event):
+        # Every full draw (first show, resize, rescale) refreshes the blit background
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    @staticmethod
+    def _fits(ax, x, y):
+        """True if the current limits still frame the data reasonably well."""
+        if not len(x):
+            return True
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        xmin, xmax, ymin, ymax = x.min(), x.max(), y.min(), y.max()
+        # The x span is set to the data's, so rounding in the relative times (or a Welch
+        # frequency grid that moves by a bin) must not count as leaving it
+        slack = (x1 - x0) * 0.02
+        if xmin < x0 - slack or xmax > x1 + slack or ymin < y0 or ymax > y1:
+            return False
+        # Shrink again only once the data uses less than a tenth of the range, so
+        # fluctuating spectra do not flip the limits back and forth
+        return (ymax - ymin) * 10 >= (y1 - y0) and (xmax - xmin) * 4 >= (x1 - x0)
+
+    @staticmethod
+    def _rescale(ax, x, y):
+        xmin, xmax, ymin, ymax = x.min(), x.max(), y.min(), y.max()
+        if xmax <= xmin:
+            xmax = xmin + 1.0
+        # Generous headroom so slowly growing data does not force a redraw every frame
+        pad = (ymax - ymin) * 0.5 or max(abs(ymax) * 0.5, 1e-3)
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin - pad, ymax + pad)
+
+    def configure(self, n_fft=None, window_name=None, spectrum_mode=None):
+        """Change FFT size, window and/or spectrum mode; takes effect (and restarts averaging) on the next frame."""
+        if n_fft is not None:
+            self.n_fft = int(n_fft)
+        if window_name is not None:
+            self.window_name = window_name
+        if spectrum_mode is not None:
+            self.spectrum_mode = spectrum_mode
+        self._engine_key = None
+
+    def engine_for(self, info):
+        """SpectralEngine for the sensor's current stream settings, rebuilt only when they change."""
+        stream = info.get("stream") or {}
+        key = (tuple(sorted(stream.items())), self.n_fft, self.window_name, self.spectrum_mode)
+        if key != self._engine_key:
+            self.engine = SpectralEngine.from_params(stream, n_fft=self.n_fft, window_name=self.window_name)
+            buffer = info["buffer"]
+            if buffer.samples_per_packet:
+                # Never ask for more frames than the ring buffer holds
+                limit = buffer.capacity * buffer.samples_per_packet // self.engine.axes
+                self.engine.n_fft = min(self.engine.n_fft, limit)
+            self.averager = None
+            if self.spectrum_mode != "fft":
+                self.averager = WelchAverager.from_engine(self.engine, overlap=self.overlap,
+                                                          mode=self.spectrum_mode, averages=self.averages)
+            self._engine_key = key
+            self.spectra = None
+            self._set_labels()
+        return self.engine
+
+    def _set_labels(self):
+        psd = self.averager is not None
+        for (ax, _), label in zip(self.groups[2:], ("PSD (g²/Hz)", "PSD ((mm/s)²/Hz)") if psd
+                                  else ("Amplitude (g)", "Amplitude (mm/s)")):
+            if ax.get_ylabel() != label:
+                ax.set_ylabel(label)
+                self.background = None  # labels are part of the background: redraw
+
+    def fft_sizes(self, info):
+        buffer = info["buffer"]
+        engine = self.engine_for(info)
+        limit = buffer.capacity * (buffer.samples_per_packet or 64) // engine.axes
+        return engine.fft_sizes(limit)
+
+    def _set_spectra(self, spectra, key):
+        if key == self._engine_key:  # drop late results computed with old settings
+            self.spectra = spectra
+
+    def _request_spectra(self, info):
+        buffer = info["buffer"]
+        engine = self.engine_for(info)
+        if not buffer.samples_per_packet or not len(buffer):
+            return
+        end_index = buffer.end_index
+        needed = (engine.n_fft + 1) * engine.axes
+        averager = self.averager
+        if averager is not None and averager.position is not None:
+            needed = max(end_index - averager.position, 0) + engine.axes  # only what the average has not seen
+        # Real values by stream index, padding dropped (a copy: the ring buffer keeps being written)
+        values, end_index = buffer.stream(needed)
+        if averager is None:
+            job, target = stream_spectra, engine
         else:
-            ax.text(0.5, 0.5, "Not enough data for FFT", ha='center', va='center')
-            ax.set_title(title)
+            job, target = welch_spectra, averager
+        if self.spectral_worker is None:
+            self.spectra = job(target, values, end_index)
+        else:
+            key = self._engine_key
+            self.spectral_worker.submit(id(self), job, (target, values, end_index),
+                                        lambda spectra: self._set_spectra(spectra, key))
 
-    # --- Acceleration Frequency Spectrum ---
-    plot_fft(ax_acc_freq, acc_means, timestamps, "Acceleration Frequency Spectrum", color="green")
+    def update(self, info):
+        start = time.perf_counter()
+        plot_data = info["buffer"].latest(self.max_points)
+        timestamps = plot_data.timestamps
+        relative = timestamps - timestamps[-1] if len(timestamps) else timestamps
+        self._request_spectra(info)
 
-    # --- Velocity Frequency Spectrum ---
-    plot_fft(ax_vel_freq, velocity, timestamps, "Velocity Frequency Spectrum", color="orange")
+        series = [[(relative, plot_data.acc_mean[:, i]) for i in range(plot_data.acc_mean.shape[1])],
+                  [(relative, plot_data.velocity[:, i]) for i in range(plot_data.velocity.shape[1])]]
+        if self.spectra is None:
+            series += [[], []]
+        else:
+            freqs, acc, vel = self.spectra
+            series += [[(freqs, acc[:, i]) for i in range(acc.shape[1])],
+                       [(freqs, vel[:, i]) for i in range(vel.shape[1])]]
+        for note in self.notes:
+            note.set_visible(self.spectra is None)
+
+        rescaled = False
+        for (ax, lines), data in zip(self.groups, series):
+            for i, line in enumerate(lines):
+                if i < len(data):
+                    line.set_data(*data[i])
+                    line.set_visible(True)
+                else:
+                    line.set_data([], [])
+                    line.set_visible(bool(i == 0 and not data))
+            if data:
+                x = np.concatenate([d[0] for d in data])
+                y = np.concatenate([d[1] for d in data])
+                if not self._fits(ax, x, y):
+                    self._rescale(ax, x, y)
+                    rescaled = True
+
+        if rescaled or self.background is None:
+            self.redraws += 1
+            self.canvas.draw()  # draw_event grabs the new background and draws the lines
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_artists()
+            self.canvas.blit(self.figure.bbox)
+        self.frame_ms = (time.perf_counter() - start) * 1e3
 
-    # Redraw canvas
-    canvas.draw_idle()
+    def start(self, info):
+        """Update every ``interval`` ms until the window is closed."""
+        widget = self.canvas.get_tk_widget()
+        if not widget.winfo_exists():
+            return
+        self.update(info)
+        widget.after(self.interval, lambda: self.start(info))
 
-    # Schedule next update in 200 ms
-    canvas.get_tk_widget().after(200, lambda: update_plot_display(info, canvas, ax_acc_time, ax_vel_time, ax_acc_freq, ax_vel_freq, max_points))
 
+def update_plot_display(info, canvas, ax_acc_time, ax_vel_time, ax_acc_freq, ax_vel_freq, max_points=200,
+                        spectral_worker=None):
+    """Start the periodic plot refresh of a device window; returns its PlotRenderer."""
+    renderer = PlotRenderer(canvas, ax_acc_time, ax_vel_time, ax_acc_freq, ax_vel_freq, max_points,
+                            spectral_worker=spectral_worker)
+    renderer.start(info)
+    return renderer
 
-from threading import Thread
 
-def compute_fft_async(data, time_data, callback):
-    def worker():
-        n = len(data)
-        if n > 1:
-            dt_arr = np.diff(time_data)
-            dt = np.mean(dt_arr[dt_arr > 0]) if np.any(dt_arr > 0) else 1e-6
-            freqs = np.fft.rfftfreq(n, d=dt)
-            fft_vals = np.abs(np.fft.rfft(data))
-            callback(freqs, fft_vals)
-    Thread(target=worker, daemon=True).start()
+def start_acceleration_stream_Scanner(sender, info, loop, calib, verbose=True):
+    """Set up the stream state in ``info`` and subscribe on ``loop``.
 
-def start_acceleration_stream_Scanner(sender, info, loop, calib):
+    Returns the concurrent future of the subscription (await it with
+    ``asyncio.wrap_future`` to see it fail), or None if the calibration is unusable.
+    ``verbose=False`` keeps the handler quiet (benches): losses and silences are
+    still counted in ``info["stream_stats"]``, only not printed.
+    """
     if "count_notify" not in info:
         info["count_notify"] = 0
+    if "buffer" not in info:
+        info["buffer"] = SensorRingBuffer()
+    # Fresh filter state per stream: velocity / displacement at the full sample rate
+    integrator = StreamIntegrator.from_params(info.get("stream") or {})
+    info["integrator"] = integrator
+    # Per-connection sample clock: timestamps come from the sample counter, not the arrival time
+    stream = info.get("stream") or {}
+    timebase = Timebase.from_params(stream)
+    stats = StreamStats(timebase)
+    info["timebase"] = timebase
+    info["stream_stats"] = stats
+    # Traces of trace_len frames, assembled in place; subscribers carry over from the last session.
+    # Values are held back for two confirmation windows, so a loss the timebase finds late can still move them
+    traces = TraceAssembler.from_params(stream, settle=int(2 * timebase.confirm_seconds * timebase.value_rate))
+    if info.get("traces") is not None:
+        info["traces"].flush()
+        traces.subscribers.extend(info["traces"].subscribers)
+    info["traces"] = traces
+    axes = mapped("axes", stream.get("axes"), 1)
+    try:
+        decoder = Decoder.from_params(stream, calibration=calib)
+    except (TypeError, ValueError, ZeroDivisionError) as e:
+        print(f"{info.get('address', sender)}: no usable calibration ({calib!r}), not streaming: {e}")
+        return
+    info["decoder"] = decoder
+    # Packets are decoded into two buffers used in turn, so the previous packet stays intact
+    scratch = [np.empty(256, dtype=np.float32), np.empty(256, dtype=np.float32)]
+    previous = None  # last decoded packet, the left edge for filling a gap
+    # Longer gaps are left empty: interpolating them would allocate (and integrate) without bound
+    max_fill = int(timebase.confirm_seconds * timebase.value_rate)
+
+    def fill_gap(packet, acc_values):
+        """Interpolated rows for the values lost before ``packet``, added to the buffer and the integrator."""
+        spp = info["buffer"].samples_per_packet or len(acc_values)
+        start = packet.first_index - packet.gap - len(previous)
+        filled = fill_gaps(np.concatenate([previous, acc_values]), start,
+                           [(packet.first_index - packet.gap, packet.gap)], axes)
+        missing = filled[len(previous):len(previous) + packet.gap]
+        rows = np.zeros((-(-len(missing) // spp), spp), dtype=np.float32)
+        rows.flat[:len(missing)] = missing
+        counts = np.minimum(len(missing) - np.arange(len(rows)) * spp, spp)  # the last row may be short
+        integrator.feed(missing)
+        gap_start = packet.first_index - packet.gap
+        # Per-axis mean of every row at once: each whole frame counts towards the row it starts in
+        frames = deinterleave(missing, gap_start, axes)
+        row_of = ((-gap_start) % axes + np.arange(len(frames)) * axes) // spp
+        means = np.zeros((len(rows), axes))
+        np.add.at(means, row_of, frames)
+        means /= np.maximum(np.bincount(row_of, minlength=len(rows)), 1)[:, None]
+        first = gap_start + np.arange(len(rows)) * spp
+        velocity = integrator.velocity_rms(per_axis=True)
+        info["buffer"].extend(timebase.to_wall(timebase.host_time(first)), means,
+                              np.broadcast_to(velocity, means.shape), rows, first, counts)
 
     async def notification_handler(sender, data):
-        now = time.time()  # current timestamp
+        nonlocal previous
+        arrival = time.monotonic()
+        capture = info.get("capture")
+        if capture is not None:
+            capture.record(data)  # raw bytes, before any decoding or accounting
+        packet = stats.on_packet(data, arrival)
+        if packet is None:
+            return  # re-delivered payload
+        now = timebase.to_wall(packet.t_first)  # wall-clock time of the packet's first sample
+        counts = Decoder.counts(data)
+        archive = info.get("archive")
+        if archive is not None:
+            archive.append(counts, now)
 
-        calib_value = int(calib)
-        conversion_factor = 250000/(65536*calib_value)
-        acc_values = [(reading - 32768) * conversion_factor for reading in list(data)]
-        acc_mean = sum(acc_values) / len(acc_values)  # simple example
+        out = scratch[stats.packets % 2]
+        if len(out) < len(counts):
+            out = scratch[stats.packets % 2] = np.empty(len(counts), dtype=np.float32)
+        acc_values = decoder.decode_into(counts, out)
+        # Axes are interleaved: per-axis means over the packet's whole frames (a strided view, no copy)
+        frames = deinterleave(acc_values, packet.first_index, axes)
+        acc_mean = frames.mean(axis=0) if len(frames) else np.zeros(axes)
 
-        if len(info["data"]) == 0:
-            print("calibration is: ", calib_value)
+        buffer = info["buffer"]
+        if verbose and len(buffer) == 0:
+            print("calibration is: ", decoder.calibration, "gain:", decoder.gain)
             print("Data length of one notification:", len(acc_values))
+        if packet.restart:
+            if verbose:
+                print(f"{info.get('address', sender)}: stream resumed after {stats.silences[-1][1]:.1f} s of silence")
+            integrator.reset()
+            previous = None
+        if packet.gap and previous is not None:
+            if verbose:
+                print(f"{info.get('address', sender)}: {packet.gap} samples missing before sample {packet.first_index}")
+            if packet.gap <= max_fill:
+                fill_gap(packet, acc_values)  # keeps the buffer's sample count (and axis phase) in step
+            else:
+                integrator.reset()  # too long to bridge: the filters start again after it
+        if packet.gap:
+            traces.shift(packet.late_from, packet.late_to, packet.gap)
+        previous = acc_values
+        traces.feed(acc_values, packet.first_index, packet.t_first)
+        integrator.feed(acc_values)
+        velocity = integrator.velocity_rms(per_axis=True)  # mm/s RMS of the newest integrated block
 
-        if len(info["data"]) == 0:
-            # First measurement, assume velocity = 0
-            velocity = 0
-        else:
-            # Previous velocity
-            prev_velocity = info["data"][-1].get("velocity", 0)
-            prev_time = info["data"][-1]["timestamp"]
-            dt = now - prev_time  # time difference in seconds
-            velocity = prev_velocity + acc_mean * dt
-
-        info["data"].append({
-            "timestamp": round(now, 2),
-            "acc_mean": round(acc_mean, 2),
-            "acc_values": [round(v, 2) for v in acc_values],
-            "velocity": round(velocity, 2),
-        })
+        buffer.append(now, acc_mean, velocity, acc_values, packet.first_index)
 
         info["count_notify"] += 1
-        if info["count_notify"] % 20 == 0:
+        if verbose and info["count_notify"] % 20 == 0:
             print("Notification count:", info["count_notify"])
 
-            if len(info["data"]) > 1:
-                duration = info["data"][-1]["timestamp"] - info["data"][0]["timestamp"]
+            if len(buffer) > 1:
+                duration = buffer.last_timestamp - buffer.first_timestamp
                 print("In Handler-Get notified time:", duration)
 
     async def start_notify_task():
-        print("\nNotify:")
-        print("sender: ", sender)
-        print("Connected: ", sender.is_connected)
+        if verbose:
+            print("\nNotify:")
+            print("sender: ", sender)
+            print("Connected: ", sender.is_connected)
         if sender and sender.is_connected:
             # Start notifications
             await sender.start_notify(DATA_UUID, notification_handler)
-            print("Get notified time: ", info["data"][-1]["timestamp"]-info["data"][0]["timestamp"])   # never run
         else:
-            print("Client not connected, cannot start notifications")
+            raise ConnectionError("Client not connected, cannot start notifications")
 
     # Schedule the coroutine safely from synchronous context
-    asyncio.run_coroutine_threadsafe(start_notify_task(), loop)
-    print("Finish.")
+    subscribed = asyncio.run_coroutine_threadsafe(start_notify_task(), loop)
+    if verbose:
+        print("Finish.")
     # print("Notifications started — returning control immediately")
     # if len(info["data"]) > 1:
     #     print("Initial Get notified time:", info["data"][-1]["timestamp"] - info["data"][0]["timestamp"])
         #
+    return subscribed
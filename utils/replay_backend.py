@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+from .capture import CaptureReader
+from .log_parser import read_log
+from .sensor_map import MAPPINGS
+from .sim_backend import SIM_SENSORS, SimClient, SimCharacteristic, SimSensor, LinkModel, DATA_UUID
+
+
+class ReplaySensor(SimSensor):
+    """A simulated sensor whose data notifications come from a recording."""
+
+    def __init__(self, address, payloads, registers=None, name=None, repeat=False):
+        super().__init__(address, name=name, registers=registers,
+                         link=LinkModel(latency=0.0, jitter=0.0, connect_time=0.0))
+        self.payloads = payloads
+        self.position = 0
+        self.repeat = repeat
+
+    @property
+    def remaining(self):
+        return float("inf") if self.repeat else len(self.payloads) - self.position
+
+    def next_packets(self, count):
+        out = []
+        while len(out) < count and self.payloads:
+            if self.position >= len(self.payloads):
+                if not self.repeat:
+                    break
+                self.position = 0
+            take = self.payloads[self.position:self.position + count - len(out)]
+            self.position += len(take)
+            out.extend(take)
+        return out
+
+
+class ReplayClient(SimClient):
+    """SimClient that paces a ReplaySensor's recording.
+
+    ``speed`` is a multiplier of real time (packets are due at sample_rate * axes / 64
+    per second); ``None`` delivers as fast as the callback allows.
+    """
+
+    speed = 1.0
+    finished = None  # asyncio.Event set once the recording has been delivered
+
+    async def start_notify(self, uuid, callback, **kwargs):
+        await self._round_trip()
+        self.sensor.position = 0
+        self.finished = asyncio.Event()
+        self._notify_tasks[DATA_UUID] = asyncio.create_task(self._stream(callback))
+
+    async def _stream(self, callback, tick=0.02, burst=64):
+        sensor = self.sensor
+        characteristic = SimCharacteristic(DATA_UUID, 35)
+        is_async = asyncio.iscoroutinefunction(callback)
+        start = time.monotonic()
+        sent = 0
+        try:
+            while self._connected and sensor.remaining > 0:
+                if self.speed is None:
+                    due = burst
+                    await asyncio.sleep(0)  # let the rest of the loop breathe between bursts
+                else:
+                    await asyncio.sleep(tick)
+                    packet_rate = sensor.sample_rate * sensor.axes / 64 * self.speed
+                    due = int((time.monotonic() - start) * packet_rate) - sent
+                    if due <= 0:
+                        continue
+                sent += due
+                for payload in sensor.next_packets(due):
+                    data = bytearray(payload)
+                    if is_async:
+                        await callback(characteristic, data)
+                    else:
+                        callback(characteristic, data)
+        finally:
+            self.finished.set()
+
+
+def read_capture(path):
+    """Read a binary .bvcap capture (utils/capture.py) into (header, payloads, registers).
+
+    Unlike console dumps, captures hold the exact payloads plus sample rate and axes.
+    """
+    reader = CaptureReader(path)
+    header = {"address": reader.address, "calibration": reader.calibration, "gain": reader.gain, "factor": None}
+    registers = {"axes": reader.axes}
+    rate_codes = {int(label): raw for raw, label in MAPPINGS["sample_rate"]}
+    if reader.sample_rate in rate_codes:
+        registers["sample_rate"] = rate_codes[reader.sample_rate]
+    return header, reader.payloads(), registers
+
+
+def load_recordings(paths, repeat=False):
+    """Register one ReplaySensor per recording (console log or .bvcap) in the simulated world; returns the sensors."""
+    sensors = []
+    for path in paths:
+        if path.endswith(".bvcap"):
+            header, payloads, registers = read_capture(path)
+        else:
+            (header, payloads), registers = read_log(path), {}
+        address = header["address"] or "5E:00:00:00:FF:00"
+        while address in SIM_SENSORS:
+            # The same sensor recorded twice: give each capture its own address
+            address = address[:-2] + f"{(int(address[-2:], 16) + 1) % 256:02X}"
+        registers["gain"] = header["gain"] or 1
+        if header["calibration"]:
+            registers["calibration"] = header["calibration"]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        sensor = ReplaySensor(address, payloads, registers=registers, name=f"BluVib-REPLAY-{stem}", repeat=repeat)
+        SIM_SENSORS[address] = sensor
+        sensors.append(sensor)
+        print(f"Replay {path}: {len(payloads)} notifications as {address}")
+    return sensors
+
+
+def load_from_env():
+    """Configure replay from $BLUVIB_REPLAY (paths, os.pathsep separated), $BLUVIB_REPLAY_SPEED and $BLUVIB_REPLAY_REPEAT."""
+    paths = [p for p in os.environ.get("BLUVIB_REPLAY", "").split(os.pathsep) if p]
+    speed = os.environ.get("BLUVIB_REPLAY_SPEED", "1")
+    ReplayClient.speed = None if speed in ("max", "0") else float(speed)
+    load_recordings(paths, repeat=os.environ.get("BLUVIB_REPLAY_REPEAT", "0") == "1")
@@ -0,0 +1,168 @@
+from collections import namedtuple
+
+import numpy as np
+
+RingView = namedtuple("RingView", ["timestamps", "acc_mean", "velocity", "samples"])
+
+
+class SensorRingBuffer:
+    """Fixed-capacity notification store for one sensor.
+
+    Every column is preallocated twice over: each row is written at ``i`` and
+    ``i + capacity``, so the newest ``n`` rows are always one contiguous slice
+    and ``latest(n)`` can hand out views instead of copies. ``acc_mean`` and
+    ``velocity`` have one column per sensor axis (width taken from the first
+    append); ``samples`` keeps the packet's values as received, interleaved.
+    Each row also records the stream index of its first value and how many of
+    its values are real (short packets and the last row of a filled gap are
+    zero-padded), so ``stream()`` can hand out the values exactly as the sensor
+    produced them.
+    """
+
+    def __init__(self, capacity=4096, samples_per_packet=None, axes=1):
+        self.capacity = capacity
+        self.samples_per_packet = samples_per_packet
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self.first_index = np.zeros(2 * capacity, dtype=np.int64)  # stream index of each row's first value
+        self.counts = np.zeros(2 * capacity, dtype=np.int64)       # valid values per row
+        self._allocate_axes(axes)
+        self.samples = None
+        if samples_per_packet:
+            self._allocate_samples(samples_per_packet)
+        self._head = 0  # next row to write, in [0, capacity)
+        self._size = 0
+        self.total = 0  # rows appended since the last clear()
+        self.end_index = 0  # stream index just after the newest row's values
+
+    def _allocate_axes(self, axes):
+        self.axes = axes
+        self.acc_mean = np.zeros((2 * self.capacity, axes), dtype=np.float32)
+        self.velocity = np.zeros((2 * self.capacity, axes), dtype=np.float32)
+
+    def _allocate_samples(self, width):
+        self.samples_per_packet = width
+        self.samples = np.zeros((2 * self.capacity, width), dtype=np.float32)
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self.total = 0
+        self.end_index = 0
+
+    def _check_axes(self, width):
+        if width != self.axes:
+            # Axis count changed (new stream settings): start over with the new width
+            self._allocate_axes(width)
+            self.clear()
+
+    def append(self, timestamp, acc_mean, velocity, samples, first_index=None):
+        """Append one row; ``acc_mean`` and ``velocity`` are scalars or one value per axis.
+
+        ``first_index`` is the stream index of ``samples[0]``; by default the row follows the previous one.
+        """
+        acc_mean = np.atleast_1d(acc_mean)
+        self._check_axes(len(acc_mean))
+        if self.samples is None:
+            self._allocate_samples(len(samples))
+        i = self._head
+        j = i + self.capacity
+        self.timestamps[i] = self.timestamps[j] = timestamp
+        self.acc_mean[i] = self.acc_mean[j] = acc_mean
+        self.velocity[i] = self.velocity[j] = velocity
+
+        # Short packets are zero-padded, long ones truncated to the column width
+        n = min(len(samples), self.samples_per_packet)
+        self.samples[i, :n] = samples[:n]
+        self.samples[i, n:] = 0
+        self.samples[j] = self.samples[i]
+        first_index = self.end_index if first_index is None else first_index
+        self.first_index[i] = self.first_index[j] = first_index
+        self.counts[i] = self.counts[j] = n
+        self.end_index = first_index + n
+
+        self._head = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, timestamps, acc_mean, velocity, samples, first_index=None, counts=None):
+        """Append many rows at once: ``acc_mean``/``velocity`` are (rows, axes), ``samples`` (rows, width).
+
+        ``first_index`` and ``counts`` give each row's stream index and valid values (default:
+        full rows following the previous one). Only the newest ``capacity`` rows are kept.
+        """
+        acc_mean = np.asarray(acc_mean).reshape(len(timestamps), -1)
+        velocity = np.asarray(velocity).reshape(len(timestamps), -1)
+        self._check_axes(acc_mean.shape[1])
+        if self.samples is None:
+            self._allocate_samples(samples.shape[1])
+        rows = len(timestamps)
+        keep = min(rows, self.capacity)
+        cols = min(samples.shape[1], self.samples_per_packet)
+        counts = np.minimum(np.full(rows, cols) if counts is None else np.asarray(counts), cols)
+        if first_index is None:
+            first_index = self.end_index + np.concatenate([[0], np.cumsum(counts[:-1])])
+        first_index = np.asarray(first_index, dtype=np.int64)
+        # Row k of the kept block lands at (head + rows - keep + k) % capacity and its mirror
+        slots = (self._head + rows - keep + np.arange(keep)) % self.capacity
+        for target in (slots, slots + self.capacity):
+            self.timestamps[target] = timestamps[-keep:]
+            self.acc_mean[target] = acc_mean[-keep:]
+            self.velocity[target] = velocity[-keep:]
+            self.samples[target, :cols] = samples[-keep:, :cols]
+            self.samples[target, cols:] = 0
+            self.first_index[target] = first_index[-keep:]
+            self.counts[target] = counts[-keep:]
+        if rows:
+            self.end_index = int(first_index[-1] + counts[-1])
+        self._head = (self._head + rows) % self.capacity
+        self._size = min(self._size + rows, self.capacity)
+        self.total += rows
+
+    @property
+    def last_timestamp(self):
+        return self.timestamps[self._head + self.capacity - 1] if self._size else None
+
+    @property
+    def last_velocity(self):
+        """Velocity per axis of the newest row (zeros when empty)."""
+        return self.velocity[self._head + self.capacity - 1] if self._size else np.zeros(self.axes, dtype=np.float32)
+
+    @property
+    def first_timestamp(self):
+        return self.timestamps[self._head + self.capacity - self._size] if self._size else None
+
+    def latest(self, n=None):
+        """Return views of the newest ``n`` rows (all rows if ``n`` is None), oldest first."""
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity
+        start = end - n
+        samples = self.samples[start:end] if self.samples is not None else np.zeros((0, 0), dtype=np.float32)
+        return RingView(self.timestamps[start:end], self.acc_mean[start:end],
+                        self.velocity[start:end], samples)
+
+    def stream(self, values=None):
+        """The newest (at least ``values``) real values as one contiguous array, and the stream index after them.
+
+        Rows are cut to their valid length, and the values start after the last break in
+        the stream indices (a gap left unfilled), so index arithmetic on the result
+        holds. Returns a copy: ``(samples, end_index)``.
+        """
+        end = self._head + self.capacity
+        start = end - self._size
+        firsts = self.first_index[start:end]
+        counts = self.counts[start:end]
+        breaks = np.flatnonzero(firsts[1:] != firsts[:-1] + counts[:-1])
+        if len(breaks):
+            start += breaks[-1] + 1
+        if values is not None:
+            # Whole rows from the newest back until ``values`` are covered
+            covered = np.cumsum(self.counts[start:end][::-1])
+            start = end - min(int(np.searchsorted(covered, values)) + 1, end - start)
+        if start == end or self.samples is None:
+            return np.zeros(0, dtype=np.float32), self.end_index
+        rows = self.samples[start:end]
+        valid = np.arange(rows.shape[1]) < self.counts[start:end, None]
+        return rows[valid], int(self.first_index[end - 1] + self.counts[end - 1])
@@ -1,3 +1,6 @@
+# Service UUID advertised by every BluVib sensor
+BLUVIB_SERVICE_UUID = "1c930001-d459-11e7-9296-b8e856369374"
+
 UUID_DATA = {
     'data': ("1c930020-d459-11e7-9296-b8e856369374", 16),  #
     'calibration': ("1c930029-d459-11e7-9296-b8e856369374", 2),  #
@@ -102,3 +105,8 @@ MAPPINGS = {
 }
 
 
+
+# FFT windows offered by the sensor (index = raw value of the window characteristic)
+# and used by utils/spectral.py for the plots
+WINDOW_TYPES = ["Hann", "Hamming", "Blackman", "Nuttall", "Blackman-Nuttall",
+                "Blackman-Harris", "Flattop", "Rectangular"]
@@ -1,4 +1,3 @@
-import asyncio
 
 from utils.sensor_map import UUID_DATA
 
@@ -8,19 +7,35 @@ TIME_UUID, _ = UUID_DATA["time"]
 
 
 def update_temp_time(app):
-    asyncio.run_coroutine_threadsafe(
-        async_update_sensor_readings(app.client, app.temp_var, app.battery_var, app.time_var),
-        app.loop
-    )
+    future = app.dispatcher.submit(async_update_sensor_readings(app.sensor_connection))
+    # The read finishes on the GATT thread; the StringVars are only touched on the Tk thread
+    future.add_done_callback(lambda fut: app.root.after(0, lambda: _show_sensor_readings(app, fut)))
     app.root.after(200000, lambda: update_temp_time(app))
 
 
-async def async_update_sensor_readings(client, temp_var, battery_var, time_var):
-    """Read temperature and battery from BLE and update Tkinter StringVars."""
+def _show_sensor_readings(app, future):
+    try:
+        readings = future.result()
+    except Exception as e:
+        print(f"Sensor readings failed for {app.address}:", e)
+        return
+    if readings:
+        set_sensor_readings(app.temp_var, app.battery_var, app.time_var, *readings)
+
+
+async def async_update_sensor_readings(sensor_connection):
+    """Read the temperature, battery and time registers; returns the raw values, or None when not connected."""
+    client = sensor_connection.get_client()  # the current link's client, not the one from window creation
+    if not client or not client.is_connected:
+        return None
     temp_raw = await read_int_value(client, TEMP_UUID)
     batt_raw = await read_int_value(client, BATTERY_UUID)
     time_raw = await read_byte_value(client, TIME_UUID)
-    print(time_raw)
+    return temp_raw, batt_raw, time_raw
+
+
+def set_sensor_readings(temp_var, battery_var, time_var, temp_raw, batt_raw, time_raw):
+    """Format raw temperature/battery/time registers into the Tkinter StringVars."""
     if temp_raw is not None:
         temp_var.set(f"Temp: {temp_raw / 256.0:.2f} °C")
     if batt_raw is not None:
@@ -0,0 +1,312 @@
+import asyncio
+import os
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .decoder import Decoder
+from .sensor_map import UUID_MAP, UUID_DATA, UUID_MAP_BUTTON, MAPPINGS, BLUVIB_SERVICE_UUID
+
+DATA_UUID, _ = UUID_DATA["data"]
+VALUES_PER_PACKET = 64  # uint16 values per data notification, as seen in log/*.log
+
+SimDevice = namedtuple("SimDevice", ["address", "name", "details"])
+SimAdvertisement = namedtuple("SimAdvertisement",
+                              ["local_name", "rssi", "service_uuids", "service_data", "manufacturer_data"])
+
+
+class SimCharacteristic(namedtuple("SimCharacteristic", ["uuid", "handle"])):
+    def __str__(self):
+        return f"{self.uuid} (Handle: {self.handle}): Unknown"
+
+
+class SignalModel:
+    """Synthetic vibration in g: tones + noise + bearing-fault impulses, 1 g of gravity on the last axis."""
+
+    def __init__(self, tones=((50.0, 0.20), (120.0, 0.05)), noise=0.01,
+                 fault_rate=87.0, fault_amplitude=0.3, resonance=3000.0, decay=800.0, seed=None):
+        self.tones = tones  # (frequency Hz, amplitude g)
+        self.noise = noise
+        self.fault_rate = fault_rate  # impulses per second (0 disables)
+        self.fault_amplitude = fault_amplitude
+        self.resonance = resonance
+        self.decay = decay
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self, start, count, sample_rate, axes):
+        """Return a (count, axes) float array for samples start .. start + count - 1."""
+        t = (start + np.arange(count)) / sample_rate
+        out = np.empty((count, axes))
+        for axis in range(axes):
+            phase = axis * np.pi / 3
+            x = np.zeros(count)
+            for freq, amp in self.tones:
+                x += amp * np.sin(2 * np.pi * freq * t + phase)
+            if self.fault_rate:
+                # Every impulse rings the structure's resonance down until the next one
+                tau = np.mod(t, 1.0 / self.fault_rate)
+                x += self.fault_amplitude * np.exp(-self.decay * tau) * np.sin(2 * np.pi * self.resonance * tau)
+            x += self.noise * self.rng.standard_normal(count)
+            out[:, axis] = x
+        out[:, -1] += 1.0
+        return out
+
+
+class LinkModel:
+    """Radio behaviour: per-operation latency, lost notifications and random link drops."""
+
+    def __init__(self, latency=0.005, jitter=0.002, packet_loss=0.0, drops_per_hour=0.0, connect_time=0.3):
+        self.latency = latency
+        self.jitter = jitter
+        self.packet_loss = packet_loss  # probability a notification never arrives
+        self.drops_per_hour = drops_per_hour
+        self.connect_time = connect_time
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def drops_link(self, interval):
+        return self.drops_per_hour > 0 and random.random() < self.drops_per_hour * interval / 3600.0
+
+
+def default_registers():
+    """Raw register values of a freshly configured sensor."""
+    return {
+        "axes": 3,
+        "sample_rate": 1,  # 25600 Hz
+        "gain": 1,
+        "mode": 1,  # Continuous
+        "holdoff_interval": 10,
+        "wakeup_interval": 60,
+        "trace_len": 1,
+        "trigger_delay": 0,
+        "calibration": 7813,
+        "temp": int(24.5 * 256),
+        "battery": 3000,
+    }
+
+
+class SimSensor:
+    """State of one simulated BluVib: its registers, signal and link."""
+
+    def __init__(self, address, name=None, registers=None, signal=None, link=None, rssi=-60):
+        self.address = address
+        self.name = name or f"BluVib-SIM-{address[-5:].replace(':', '')}"
+        self.registers = dict(default_registers(), **(registers or {}))
+        self.signal = signal or SignalModel()
+        self.link = link or LinkModel()
+        self.rssi = rssi
+        self.sample_index = 0  # samples produced since the stream (re)started
+        self.powered = True
+        self.sizes = {key: size for key, (_, size) in {**UUID_DATA, **UUID_MAP}.items()}
+        self.keys = {}
+        for key, (uuid, _) in {**UUID_DATA, **UUID_MAP}.items():
+            self.keys.setdefault(uuid.lower(), key)
+
+    def mapped(self, key):
+        return int(dict(MAPPINGS[key])[self.registers[key]])
+
+    @property
+    def sample_rate(self):
+        return self.mapped("sample_rate")
+
+    @property
+    def axes(self):
+        return self.registers["axes"]
+
+    def read(self, uuid):
+        key = self.keys.get(uuid.lower())
+        if key is None or key == "data":
+            raise ValueError(f"Characteristic {uuid} is not readable")
+        if key == "time":
+            now = time.localtime()
+            return bytearray([now.tm_hour, now.tm_min, now.tm_sec])
+        return bytearray(int(self.registers[key]).to_bytes(self.sizes[key], "little", signed=key in ("temp",)))
+
+    def write(self, uuid, data):
+        key = self.keys.get(uuid.lower())
+        if key is None or key == "data":
+            raise ValueError(f"Characteristic {uuid} is not writable")
+        self.registers[key] = int.from_bytes(data, "little")
+
+    def next_packets(self, count):
+        """Encode the next ``count`` notifications as raw little-endian uint16 payloads."""
+        axes = self.axes
+        values = count * VALUES_PER_PACKET
+        # Axes are interleaved, so a packet may start on any axis
+        first_frame, offset = divmod(self.sample_index, axes)
+        frames = -(-(offset + values) // axes)
+        g = self.signal.generate(first_frame, frames, self.sample_rate, axes).ravel()[offset:offset + values]
+        raw = Decoder.from_params(self.registers).encode(g)
+        self.sample_index += values
+        return [raw[i * VALUES_PER_PACKET:(i + 1) * VALUES_PER_PACKET].tobytes() for i in range(count)]
+
+
+# ---- the simulated world: every sensor the fake scanner can see ----
+SIM_SENSORS = {}
+
+
+def add_sensor(address, **kwargs):
+    sensor = SimSensor(address, **kwargs)
+    SIM_SENSORS[address] = sensor
+    return sensor
+
+
+def populate(count=None):
+    """Create ``count`` sensors (default: $BLUVIB_SIM_SENSORS or 3) if the world is empty."""
+    if not SIM_SENSORS:
+        count = int(os.environ.get("BLUVIB_SIM_SENSORS", 3)) if count is None else count
+        for i in range(count):
+            add_sensor(f"5E:00:00:00:00:{i + 1:02X}", signal=SignalModel(seed=i))
+    return SIM_SENSORS
+
+
+def _advertisement(sensor):
+    rssi = sensor.rssi + random.randint(-4, 4)
+    device = SimDevice(sensor.address, sensor.name, None)
+    return device, SimAdvertisement(sensor.name, rssi, [BLUVIB_SERVICE_UUID], {}, {})
+
+
+class SimScanner:
+    """Stand-in for BleakScanner over SIM_SENSORS."""
+
+    def __init__(self, detection_callback=None, service_uuids=None, advertising_interval=0.1, **kwargs):
+        self.detection_callback = detection_callback
+        self.advertising_interval = advertising_interval
+        self._task = None
+
+    async def start(self):
+        populate()
+        self._task = asyncio.create_task(self._advertise())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _advertise(self):
+        while True:
+            for sensor in list(SIM_SENSORS.values()):
+                if sensor.powered and self.detection_callback:
+                    self.detection_callback(*_advertisement(sensor))
+            await asyncio.sleep(self.advertising_interval)
+
+    @classmethod
+    async def discover(cls, timeout=5.0, return_adv=False, **kwargs):
+        populate()
+        await asyncio.sleep(min(timeout, 0.2))
+        found = {s.address: _advertisement(s) for s in SIM_SENSORS.values() if s.powered}
+        return found if return_adv else [device for device, _ in found.values()]
+
+    @classmethod
+    async def find_device_by_address(cls, address, timeout=10.0, **kwargs):
+        populate()
+        sensor = SIM_SENSORS.get(address)
+        await asyncio.sleep(min(timeout, 0.2))
+        return _advertisement(sensor)[0] if sensor and sensor.powered else None
+
+
+class SimClient:
+    """Stand-in for BleakClient talking to a SimSensor."""
+
+    def __init__(self, address_or_device, disconnected_callback=None, timeout=10.0, **kwargs):
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self.disconnected_callback = disconnected_callback
+        self.timeout = timeout
+        self._connected = False
+        self._notify_tasks = {}
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    @property
+    def sensor(self):
+        return SIM_SENSORS.get(self.address)
+
+    async def connect(self, **kwargs):
+        populate()
+        sensor = self.sensor
+        if sensor is None or not sensor.powered:
+            await asyncio.sleep(self.timeout)
+            raise TimeoutError(f"Device {self.address} not found")
+        await asyncio.sleep(sensor.link.connect_time)
+        self._connected = True
+        return True
+
+    async def disconnect(self):
+        self._drop(notify=False)
+        return True
+
+    def _drop(self, notify=True):
+        was_connected = self._connected
+        self._connected = False
+        for task in self._notify_tasks.values():
+            task.cancel()
+        self._notify_tasks.clear()
+        if notify and was_connected and self.disconnected_callback:
+            self.disconnected_callback(self)
+
+    async def _round_trip(self):
+        if not self._connected:
+            raise ConnectionError(f"Not connected to {self.address}")
+        await asyncio.sleep(self.sensor.link.delay())
+
+    async def read_gatt_char(self, uuid, **kwargs):
+        await self._round_trip()
+        return self.sensor.read(str(uuid))
+
+    async def write_gatt_char(self, uuid, data, response=None):
+        await self._round_trip()
+        uuid = str(uuid).lower()
+        if uuid in (UUID_MAP_BUTTON["shutdown"], UUID_MAP_BUTTON["restart"], UUID_MAP_BUTTON["release"]):
+            # The sensor applies the command and drops the link
+            if uuid == UUID_MAP_BUTTON["shutdown"]:
+                self.sensor.powered = False
+            asyncio.get_running_loop().call_later(0.05, self._drop)
+            return
+        if uuid == UUID_MAP_BUTTON["factory_reset"]:
+            self.sensor.registers = default_registers()
+            asyncio.get_running_loop().call_later(0.05, self._drop)
+            return
+        self.sensor.write(uuid, data)
+
+    async def start_notify(self, uuid, callback, **kwargs):
+        await self._round_trip()
+        if str(uuid).lower() != DATA_UUID:
+            raise ValueError(f"Characteristic {uuid} does not notify")
+        self.sensor.sample_index = 0
+        self._notify_tasks[DATA_UUID] = asyncio.create_task(self._stream(callback))
+
+    async def stop_notify(self, uuid):
+        task = self._notify_tasks.pop(str(uuid).lower(), None)
+        if task:
+            task.cancel()
+
+    async def _stream(self, callback, tick=0.02):
+        sensor = self.sensor
+        characteristic = SimCharacteristic(DATA_UUID, 35)
+        is_async = asyncio.iscoroutinefunction(callback)
+        start = time.monotonic()
+        sent = 0
+        while self._connected:
+            await asyncio.sleep(tick)
+            if sensor.link.drops_link(tick):
+                self._drop()
+                return
+            # Emit every packet that is due by now, in one burst per tick
+            packet_rate = sensor.sample_rate * sensor.axes / VALUES_PER_PACKET
+            due = int((time.monotonic() - start) * packet_rate) - sent
+            if due <= 0:
+                continue
+            sent += due
+            for payload in sensor.next_packets(due):
+                if sensor.link.packet_loss and random.random() < sensor.link.packet_loss:
+                    continue
+                data = bytearray(payload)
+                if is_async:
+                    await callback(characteristic, data)
+                else:
+                    callback(characteristic, data)
@@ -0,0 +1,218 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .sensor_map import MAPPINGS, WINDOW_TYPES
+
+G = 9.80665  # m/s^2 per g
+
+# Cosine-sum coefficients a0, a1, ... of w[k] = sum (-1)^j a_j cos(2 pi j k / n)
+WINDOW_COEFFICIENTS = {
+    "Hann": (0.5, 0.5),
+    "Hamming": (0.54, 0.46),
+    "Blackman": (0.42, 0.5, 0.08),
+    "Nuttall": (0.355768, 0.487396, 0.144232, 0.012604),
+    "Blackman-Nuttall": (0.3635819, 0.4891775, 0.1365995, 0.0106411),
+    "Blackman-Harris": (0.35875, 0.48829, 0.14128, 0.01168),
+    "Flattop": (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368),
+    "Rectangular": (1.0,),
+}
+
+
+@lru_cache(maxsize=64)
+def window(n, name="Hann"):
+    """Periodic (DFT-even) window of length ``n``; cached and read-only, so it is shared."""
+    if name not in WINDOW_TYPES:
+        raise ValueError(f"Unknown window {name!r}, choose from {WINDOW_TYPES}")
+    phase = 2 * np.pi * np.arange(n) / n
+    w = np.zeros(n)
+    for j, a in enumerate(WINDOW_COEFFICIENTS[name]):
+        w += (-1) ** j * a * np.cos(j * phase)
+    w = w.astype(np.float32)
+    w.flags.writeable = False
+    return w
+
+
+@lru_cache(maxsize=64)
+def frequencies(n, sample_rate):
+    f = np.fft.rfftfreq(n, d=1.0 / sample_rate)
+    f.flags.writeable = False
+    return f
+
+
+def mapped(key, raw, default):
+    """Numeric value of a mapped parameter (e.g. sample_rate code 1 -> 25600)."""
+    try:
+        return int(dict(MAPPINGS[key])[raw])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+class SpectralEngine:
+    """Amplitude spectra of the raw sample stream, all axes in one FFT call.
+
+    ``values`` are the decoded g values of the stream, axes interleaved, with
+    ``end_index`` values received since the stream started (so the frame phase of
+    the interleaving is known even though packets do not end on frame boundaries).
+    """
+
+    def __init__(self, sample_rate=25600, axes=1, n_fft=4096, window_name="Hann", max_fft=None):
+        self.sample_rate = sample_rate
+        self.axes = max(int(axes), 1)
+        self.window_name = window_name
+        self.max_fft = max_fft
+        self.n_fft = self.clamp(n_fft)
+
+    @classmethod
+    def from_params(cls, params, n_fft=None, window_name="Hann"):
+        """Build from raw register values (as read from the sensor): sample_rate, axes, trace_len."""
+        trace_len = mapped("trace_len", params.get("trace_len"), 4096)
+        return cls(sample_rate=mapped("sample_rate", params.get("sample_rate"), 25600),
+                   axes=mapped("axes", params.get("axes"), 1),
+                   n_fft=n_fft or trace_len, window_name=window_name, max_fft=trace_len)
+
+    def clamp(self, n_fft):
+        n_fft = int(n_fft)
+        if self.max_fft:
+            n_fft = min(n_fft, self.max_fft)
+        return max(n_fft, 8)
+
+    def fft_sizes(self, limit=None):
+        """Power-of-two FFT sizes a UI can offer, up to trace_len (and ``limit``)."""
+        top = min(x for x in (self.max_fft, limit, 1 << 20) if x)
+        return [1 << k for k in range(8, top.bit_length()) if 1 << k <= top]
+
+    @property
+    def freqs(self):
+        return frequencies(self.n_fft, self.sample_rate)
+
+    def frames(self, values, end_index):
+        """Newest ``n_fft`` whole frames as an (n, axes) view, or None if there are not enough yet."""
+        axes = self.axes
+        values = values[:len(values) - end_index % axes]  # drop the trailing partial frame
+        # The trimmed end is a frame boundary (its start need not be): count back from it
+        if len(values) < self.n_fft * axes:
+            return None
+        return values[len(values) - self.n_fft * axes:].reshape(-1, axes)
+
+    def spectrum(self, values, end_index):
+        """(freqs, amplitude in g per axis with shape (bins, axes)), or (None, None)."""
+        frames = self.frames(values, end_index)
+        if frames is None:
+            return None, None
+        w = window(self.n_fft, self.window_name)
+        data = frames - frames.mean(axis=0)  # drop DC (gravity) per axis
+        data *= w[:, None]
+        amplitude = np.abs(np.fft.rfft(data, axis=0))
+        amplitude *= 2.0 / w.sum()
+        return self.freqs, amplitude
+
+    def velocity_spectrum(self, freqs, amplitude):
+        """Acceleration amplitude (g) to velocity amplitude (mm/s): divide by 2 pi f."""
+        with np.errstate(divide="ignore"):
+            scale = np.where(freqs > 0, G * 1000.0 / (2 * np.pi * freqs), 0.0)
+        return amplitude * scale[:, None]
+
+
+AVERAGING_MODES = ("linear", "exponential", "peak")
+
+
+class WelchAverager:
+    """Streaming Welch power spectral density, per axis.
+
+    ``feed`` takes the newest block of the stream (same convention as
+    ``SpectralEngine.spectrum``) and only transforms segments it has not seen,
+    so each frame costs O(new samples) rather than a transform of the whole
+    history. Segments of ``n_fft`` frames advance by ``n_fft * (1 - overlap)``;
+    their periodograms are folded into a linear mean, an exponential average
+    (weight ``1 / averages``) or a peak hold.
+    """
+
+    def __init__(self, sample_rate=25600, axes=1, n_fft=1024, window_name="Hann", overlap=0.5,
+                 mode="linear", averages=16):
+        if mode not in AVERAGING_MODES:
+            raise ValueError(f"Unknown averaging mode {mode!r}, choose from {AVERAGING_MODES}")
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        self.sample_rate = sample_rate
+        self.axes = max(int(axes), 1)
+        self.n_fft = int(n_fft)
+        self.window_name = window_name
+        self.step = max(1, int(round(self.n_fft * (1 - overlap))))
+        self.mode = mode
+        self.averages = averages
+        w = window(self.n_fft, window_name)
+        # One-sided PSD scaling: g^2/Hz, with the non-DC/Nyquist bins doubled
+        self._scale = np.full(self.n_fft // 2 + 1, 2.0 / (sample_rate * float(np.sum(w.astype(np.float64) ** 2))))
+        self._scale[0] /= 2
+        if self.n_fft % 2 == 0:
+            self._scale[-1] /= 2
+        self.reset()
+
+    @classmethod
+    def from_engine(cls, engine, **kwargs):
+        return cls(engine.sample_rate, engine.axes, engine.n_fft, engine.window_name, **kwargs)
+
+    def reset(self):
+        self.psd = None       # (bins, axes) running result
+        self.segments = 0     # periodograms folded in since reset()
+        self.position = None  # stream index (values) just after the last frame consumed
+        self._pending = np.empty((0, self.axes), dtype=np.float32)  # frames not yet in a full segment
+
+    @property
+    def freqs(self):
+        return frequencies(self.n_fft, self.sample_rate)
+
+    def feed(self, values, end_index):
+        """Fold the not-yet-seen whole frames of ``values`` (ending at stream index ``end_index``) in."""
+        axes = self.axes
+        end = end_index - end_index % axes  # whole frames only
+        start = end_index - len(values)
+        if self.position is None or self.position < start or self.position > end:
+            # First block, a gap (lost snapshot, reconnect) or a restarted stream: start a fresh segment
+            self._pending = self._pending[:0]
+            self.position = start + (-start) % axes
+        new = values[self.position - start:end - start]
+        self.position = end
+        if new.size:
+            self._pending = np.concatenate([self._pending, new.reshape(-1, axes)])
+        count = (len(self._pending) - self.n_fft) // self.step + 1
+        if count <= 0:
+            return
+        # All complete segments in one batched transform: (segments, n_fft, axes)
+        segments = np.lib.stride_tricks.sliding_window_view(self._pending, self.n_fft, axis=0)[::self.step][:count]
+        segments = np.moveaxis(segments, -1, 1)
+        data = segments - segments.mean(axis=1, keepdims=True)
+        data *= window(self.n_fft, self.window_name)[None, :, None]
+        power = np.abs(np.fft.rfft(data, axis=1)) ** 2
+        power *= self._scale[None, :, None]
+        self._fold(power)
+        self._pending = self._pending[count * self.step:]
+
+    def _fold(self, power):
+        if self.mode == "peak":
+            peak = power.max(axis=0)
+            self.psd = peak if self.psd is None else np.maximum(self.psd, peak)
+        elif self.mode == "linear":
+            total = power.sum(axis=0)
+            if self.psd is None:
+                self.psd = total / len(power)
+            else:
+                self.psd = (self.psd * self.segments + total) / (self.segments + len(power))
+        else:
+            alpha = 1.0 / max(self.averages, 1)
+            for p in power:
+                self.psd = p if self.psd is None else self.psd + alpha * (p - self.psd)
+        self.segments += len(power)
+
+    def result(self):
+        """(freqs, PSD in g^2/Hz with shape (bins, axes)), or (None, None) before the first segment."""
+        if self.psd is None:
+            return None, None
+        return self.freqs, self.psd
+
+    def velocity_psd(self, freqs, psd):
+        """Acceleration PSD (g^2/Hz) to velocity PSD ((mm/s)^2/Hz)."""
+        with np.errstate(divide="ignore"):
+            scale = np.where(freqs > 0, G * 1000.0 / (2 * np.pi * freqs), 0.0)
+        return psd * (scale ** 2)[:, None]
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SpectralWorker:
+    """Runs spectrum computations on a persistent thread pool, off the Tk thread.
+
+    Work is keyed (one key per sensor window). A key has at most one job running
+    and one waiting: submitting again replaces the waiting snapshot, so a slow
+    frame drops stale work instead of queueing it. Finished results are handed to
+    their callbacks on the Tk thread by a single ``after()`` pump.
+    """
+
+    def __init__(self, root, max_workers=2, interval=50):
+        self.root = root
+        self.interval = interval
+        self.dropped = 0  # snapshots replaced before they were computed
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spectral")
+        self._lock = threading.Lock()
+        self._waiting = {}   # key -> (fn, args, callback), newest snapshot not started yet
+        self._running = set()
+        self._results = {}   # key -> (callback, result), newest result not yet delivered
+        self._closed = False
+        self.root.after(self.interval, self._pump)
+
+    def submit(self, key, fn, args, callback):
+        """Compute ``fn(*args)`` in the pool; ``callback(result)`` later runs on the Tk thread.
+
+        ``args`` must not change after submitting (pass copies, not ring-buffer views).
+        """
+        with self._lock:
+            if key in self._waiting:
+                self.dropped += 1
+            self._waiting[key] = (fn, args, callback)
+            if key not in self._running:
+                self._start(key)
+
+    def _start(self, key):
+        # Called with the lock held
+        job = self._waiting.pop(key)
+        self._running.add(key)
+        self._executor.submit(self._run, key, job)
+
+    def _run(self, key, job):
+        fn, args, callback = job
+        try:
+            result = fn(*args)
+        except Exception as e:
+            print(f"Spectral job {key} failed: {e}")
+            result = None
+        with self._lock:
+            if result is not None:
+                self._results[key] = (callback, result)
+            self._running.discard(key)
+            if key in self._waiting:
+                self._start(key)
+
+    def _pump(self):
+        with self._lock:
+            results, self._results = self._results, {}
+        for callback, result in results.values():
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"Spectral callback failed: {e}")
+        if not self._closed:
+            self.root.after(self.interval, self._pump)
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,109 @@
+from collections import deque
+
+import numpy as np
+
+
+class StreamStats:
+    """Per-connection accounting of what the sensor sent versus what reached the handler.
+
+    Wraps the connection's Timebase: ``on_packet`` first drops payloads that repeat
+    one of the last ``duplicate_window`` packets (re-delivered notifications would
+    otherwise shift every later sample), then lets the timebase place the packet.
+    Expected samples follow from the nominal sample rate and the time since the
+    stream started; gap runs are the timebase's confirmed gaps.
+    """
+
+    def __init__(self, timebase, duplicate_window=8):
+        self.timebase = timebase
+        self.packets = 0
+        self.received = 0     # values handed on
+        self.duplicates = 0   # payloads dropped as repeats
+        self.gap_runs = []    # (wall time, stream index, values missing)
+        self.silences = []    # (wall time, seconds) of pauses the timebase took for a stopped sensor, not loss
+        self.first_arrival = None
+        self.last_arrival = None
+        self.max_interval = 0.0  # longest silence between two notifications (s)
+        self._recent = deque(maxlen=duplicate_window)
+
+    def on_packet(self, data, arrival):
+        """Account for one notification; returns its PacketTime, or None for a duplicate."""
+        data = bytes(data)
+        # A flat payload (all values equal: sensor at rest, saturated) repeats legitimately
+        if data in self._recent and data[:2] * (len(data) // 2) != data:
+            self.duplicates += 1
+            return None
+        self._recent.append(data)
+        previous = self.last_arrival
+        if previous is None:
+            self.first_arrival = arrival
+        else:
+            self.max_interval = max(self.max_interval, arrival - self.last_arrival)
+        self.last_arrival = arrival
+        packet = self.timebase.on_packet(len(data) // 2, arrival)
+        if packet.restart:
+            self.silences.append((self.timebase.to_wall(arrival), arrival - previous))
+        if packet.gap:
+            self.gap_runs.append((self.timebase.to_wall(arrival), packet.first_index - packet.gap, packet.gap))
+        self.packets += 1
+        self.received += len(data) // 2
+        return packet
+
+    @property
+    def expected(self):
+        """Values the sensor has produced up to the last arrival.
+
+        Counted at the nominal rate from the anchor (the earliest possible arrival of
+        value 0), not through the fitted drift, so lost packets cannot cancel out. After
+        a silence the timebase re-anchors, so the pause itself is not expected data.
+        """
+        start = self.timebase.anchor
+        if start is None:
+            return 0
+        return max(int((self.last_arrival - start) * self.timebase.value_rate), self.received)
+
+    @property
+    def missing(self):
+        return self.expected - self.received
+
+    @property
+    def loss(self):
+        """Missing fraction of the expected values."""
+        expected = self.expected
+        return self.missing / expected if expected else 0.0
+
+    def summary(self):
+        return f"{self.received}/{self.expected} ({self.loss:.1%} lost)"
+
+
+def fill_gaps(values, first_index, gaps, axes=1, method="linear"):
+    """Received ``values`` (axes interleaved, ``values[0]`` at stream index ``first_index``) with gaps put back.
+
+    ``gaps`` are (stream index, length) pairs in stream order, as in ``Timebase.gaps``.
+    The missing values are zeros (``method="zero"``) or interpolated per axis
+    between the neighbouring received values (``method="linear"``).
+    """
+    values = np.asarray(values)
+    if not len(gaps):
+        return values
+    starts, lengths = np.asarray(gaps, dtype=np.int64).reshape(-1, 2).T
+    shifted = np.concatenate([[0], np.cumsum(lengths)])
+    # Gap k starts after this many received values
+    splits = starts - first_index - shifted[:-1]
+    received = np.arange(len(values))
+    positions = received + shifted[np.searchsorted(splits, received, side="right")]
+    out = np.zeros(len(values) + int(shifted[-1]), dtype=values.dtype)
+    out[positions] = values
+    if method == "zero":
+        return out
+    if method != "linear":
+        raise ValueError(f"Unknown fill method {method!r}, choose 'zero' or 'linear'")
+    mask = np.ones(len(out), dtype=bool)
+    mask[positions] = False
+    holes = np.flatnonzero(mask)
+    for axis in range(axes):
+        phase = (axis - first_index) % axes
+        xp = positions[positions % axes == phase]
+        x = holes[holes % axes == phase]
+        if len(xp) and len(x):
+            out[x] = np.interp(x, xp, out[xp])
+    return out
@@ -0,0 +1,220 @@
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .spectral import mapped
+
+# first_index: stream index (values) of the packet's first value, after any gap;
+# t_first: host time (monotonic clock) of that value; dt: seconds per value;
+# gap: values found missing just before this packet (0 if none); late_from, late_to: with a gap,
+# the stream indices (as placed so far) between which the loss happened. Values placed from
+# late_to on sit ``gap`` early (the loss was found late), those between may or may not;
+# restart: the packet ends a silence, the sensor stopped sending rather than packets being lost
+PacketTime = namedtuple("PacketTime", ["first_index", "t_first", "dt", "gap", "late_from", "late_to", "restart"])
+
+
+class Timebase:
+    """Sample-accurate timestamps for one connection's data stream.
+
+    Value ``i`` of the stream was sampled at ``i / (sample_rate * axes)`` on the
+    sensor's clock. Packets reach the host late by a variable latency, so the host
+    time of a packet end minus its nominal time is an offset plus jitter that is
+    always positive. The lower envelope of those offsets (minimum per
+    ``bin_seconds``) is fitted with a line over the last ``history`` bins: the
+    intercept anchors the sensor clock to the host's monotonic clock and the
+    slope is the clock drift.
+
+    Payloads carry no sequence number, so a lost packet only shows as every
+    later offset rising by one packet duration. Once the smallest excess over
+    the envelope in the last ``confirm_seconds`` reaches ``gap_threshold``
+    (default three quarters of a packet), that excess, rounded to whole
+    packets, is declared missing and added to the index, so later samples keep
+    their place and axis phase. A stalled handler only delays packets: they
+    arrive in a burst and the offset falls back within the window. Values that
+    arrived during the window are not moved, so they sit early. The loss came
+    after the last packet below the new level (the one whose leaving the window
+    set the declaration off) and before the window's lowest packet: ``late_from``
+    and ``late_to``. Which of the packets in between were late through jitter and
+    which through the loss cannot be told.
+
+    Losses must not be taken for a slow clock: bins still inside the
+    confirmation window stay out of the fit, each bin is folded to within half a
+    packet of the current line before fitting (so a miscounted packet cannot tilt
+    it), and the drift is clamped to ``max_drift`` (a crystal's tolerance).
+
+    A silence of ``silence_seconds`` or more is not loss: a sensor between
+    wake-ups, or a stalled link, sends nothing. The next packet restarts the
+    clock (anchor and envelope) and continues the index without a gap.
+    ``packet_values`` is learned from the first packet unless given.
+    """
+
+    def __init__(self, sample_rate=25600, axes=1, packet_values=None, clock=time.monotonic, bin_seconds=1.0,
+                 history=30, gap_threshold=None, confirm_seconds=1.0, max_drift=500e-6, silence_seconds=1.0):
+        self.value_rate = float(sample_rate) * max(int(axes), 1)
+        self.clock = clock
+        self.bin_seconds = bin_seconds
+        self.confirm_seconds = confirm_seconds
+        self.max_drift = max_drift
+        self.silence_seconds = silence_seconds
+        self._gap_threshold = gap_threshold
+        self.packet_values = self.packet_seconds = self.gap_threshold = None
+        if packet_values:
+            self._set_packet_values(packet_values)
+        self.wall_offset = time.time() - time.monotonic()  # monotonic -> wall clock, fixed per connection
+        self.index = 0          # next value's stream index
+        self.missing = 0        # values declared missing so far
+        self.gaps = []          # (stream index where the missing values were inserted, count)
+        self.restarts = []      # stream indices where the stream resumed after a silence
+        self.last_arrival = None
+        self.anchor = None      # host time of stream index 0 (lower envelope)
+        self.drift = 0.0        # sensor clock error, host seconds per sensor second - 1
+        self._bins = deque(maxlen=history)  # (nominal time, min offset, its arrival) per bin
+        self._bin_start = None
+        self._bin_min = None
+        self._declared = 0.0    # seconds of missing values declared so far
+        self._window = deque()  # (arrival, excess + declared, end index), increasing: a sliding minimum
+        self._window_start = None
+        self._left = 0          # end index of the last packet dropped from the window's start
+
+    @classmethod
+    def from_params(cls, params, **kwargs):
+        """Build from raw register values (as read from the sensor): sample_rate and axes."""
+        return cls(sample_rate=mapped("sample_rate", params.get("sample_rate"), 25600),
+                   axes=mapped("axes", params.get("axes"), 1), **kwargs)
+
+    def _set_packet_values(self, count):
+        self.packet_values = int(count)
+        self.packet_seconds = self.packet_values / self.value_rate
+        self.gap_threshold = self._gap_threshold or 0.75 * self.packet_seconds
+
+    def nominal(self, index):
+        return index / self.value_rate
+
+    def host_time(self, index):
+        """Host monotonic time of stream value ``index`` (scalar or array)."""
+        if self.anchor is None:
+            return None
+        return self.anchor + self.nominal(np.asarray(index, dtype=np.float64)) * (1.0 + self.drift)
+
+    def to_wall(self, t):
+        return t + self.wall_offset
+
+    def on_packet(self, count, arrival=None):
+        """Register a packet of ``count`` values that arrived at ``arrival`` (monotonic); returns its PacketTime."""
+        arrival = self.clock() if arrival is None else arrival
+        if self.packet_values is None:
+            self._set_packet_values(count)
+        end = self.index + count
+        offset = arrival - self.nominal(end)
+        gap = 0
+        late_from = late_to = None
+        restart = self.last_arrival is not None and arrival - self.last_arrival >= self.silence_seconds
+        self.last_arrival = arrival
+        if restart:
+            self.restarts.append(self.index)
+            self._restart()
+        if self.anchor is None:
+            self.anchor = offset - self.nominal(end) * self.drift
+            self._window_start = arrival
+            self._left = end
+        else:
+            excess = offset - (self.anchor + self.nominal(end) * self.drift)
+            gap = self._check_gap(excess, arrival, end)
+            if gap:
+                # The loss happened before the confirmation window: what arrived since is misplaced
+                late_from, late_to = self._locate()
+                # Packets from late_to on move up by the gap, as placed values do: keep the window in step
+                self._window = deque((a, key, e + gap if e > late_to else e) for a, key, e in self._window)
+                end += gap
+                offset -= self.nominal(gap)
+                excess -= self.nominal(gap)
+            if excess < 0:
+                self.anchor += excess  # a packet faster than the envelope: follow it down at once
+        self._add_to_bin(self.nominal(end), offset, arrival)
+        first_index = end - count
+        self.index = end
+        return PacketTime(first_index, self.host_time(first_index), (1.0 + self.drift) / self.value_rate, gap,
+                          late_from, late_to, restart)
+
+    def _restart(self):
+        # Offsets before the silence say nothing about the ones after it; the drift carries over
+        self.anchor = None
+        self._bins.clear()
+        self._bin_start = self._bin_min = None
+        self._window.clear()
+
+    def _locate(self):
+        """Stream indices between which a just-declared loss happened."""
+        # The last packet below the new level has just left the window: the loss came after it,
+        # and before the window's lowest packet (late by the loss). Packets in between were late
+        # by jitter or by the loss, there is no telling which. A window whose start was cleared by
+        # lower packets keeps an older left end: never look back further than the window itself
+        window = int(self.confirm_seconds * self.value_rate) + self.packet_values
+        return max(self._left, self.index - window, 0), min(self._window[0][2] - self.packet_values, self.index)
+
+    def _check_gap(self, excess, arrival, end):
+        """Values found missing (whole packets) from the sliding minimum of ``excess``."""
+        window = self._window
+        key = excess + self._declared  # stays comparable across later declarations
+        while window and window[-1][1] >= key:
+            window.pop()
+        window.append((arrival, key, end))
+        while window[0][0] < arrival - self.confirm_seconds:
+            self._left = window.popleft()[2]
+        if arrival - self._window_start < self.confirm_seconds:
+            return 0
+        excess = window[0][1] - self._declared
+        if excess < self.gap_threshold:
+            return 0
+        # Late all through the window: those packets are never coming. Packets placed
+        # meanwhile are not moved; the missing values go in before this one.
+        packets = int(round(excess / self.packet_seconds))
+        missing = packets * self.packet_values
+        self.missing += missing
+        self.gaps.append((self.index, missing))
+        seconds = self.nominal(missing)
+        self._declared += seconds
+        # The loss came before the window: minima measured since then used the short index
+        since = arrival - self.confirm_seconds
+        for i, (nominal, offset, t) in enumerate(self._bins):
+            if t >= since:
+                self._bins[i] = (nominal + seconds, offset - seconds, t)
+        nominal, offset, t = self._bin_min
+        if t >= since:
+            self._bin_min = (nominal + seconds, offset - seconds, t)
+        return missing
+
+    def _add_to_bin(self, nominal, offset, arrival):
+        if self._bin_start is None or arrival - self._bin_start >= self.bin_seconds:
+            if self._bin_min is not None:
+                self._bins.append(self._bin_min)
+                self._fit(nominal)
+            self._bin_start = arrival
+            self._bin_min = (nominal, offset, arrival)
+        elif offset < self._bin_min[1]:
+            self._bin_min = (nominal, offset, arrival)
+
+    def _fit(self, now):
+        # Bins inside the confirmation window may still hide losses not declared yet
+        settled = [b for b in self._bins if b[0] < now - self.confirm_seconds]
+        if len(settled) < 3:
+            return
+        x, y, _ = np.array(settled).T
+        if x[-1] - x[0] < 2 * self.bin_seconds:
+            return
+        # A lost packet miscounted moves a bin by whole packets, a clock error by far less
+        # per bin: fold every bin to within half a packet of the current line
+        residual = y - (self.anchor + x * self.drift)
+        y = y - np.round(residual / self.packet_seconds) * self.packet_seconds
+        slope = float(np.clip(np.polyfit(x, y, 1)[0], -self.max_drift, self.max_drift))
+        self.drift = slope
+        self.anchor = float(np.mean(y - slope * x))  # best intercept for the (clamped) slope
+
+    @property
+    def drift_ppm(self):
+        return self.drift * 1e6
+
+    def times(self, first_index, count):
+        """Host monotonic timestamps of ``count`` values starting at stream index ``first_index``."""
+        return self.host_time(first_index + np.arange(count))
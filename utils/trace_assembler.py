@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .spectral import mapped
+
+# index: trace number counted from the connection's first value (connection-relative); data: (trace_len, axes)
+# float32 g values, a view of the assembler's buffer; received: values that arrived (missing ones are 0);
+# complete: every value arrived; t_start: host time (monotonic) of the first sample
+Trace = namedtuple("Trace", ["index", "data", "received", "complete", "t_start", "sample_rate", "axes"])
+
+
+class TraceAssembler:
+    """Cuts the flat notification stream into traces of ``trace_len`` frames.
+
+    Trace ``k`` holds stream values ``k * trace_len * axes`` up to the next trace,
+    so packets that straddle a boundary are split and a gap (stream index jump)
+    leaves zeros and marks the trace incomplete; traces a gap skips entirely count
+    as incomplete too. Values are copied straight into preallocated
+    (trace_len * axes) float32 arrays used in turn, so a 2M-sample trace costs
+    one array, not a list of notifications.
+
+    Stream indices count from the first value of the connection: payloads carry no
+    sample counter, so the boundaries cannot follow the sensor's own trace start
+    and are connection-relative.
+
+    A lost packet is only found some time after it, and the values fed meanwhile
+    sit early. So that they can still be moved, fed values are held back until the
+    stream is ``settle`` values past them; ``shift`` then puts them in their place,
+    and only the traces around the loss itself (as far as it can be located) end
+    up incomplete. A finished
+    trace is passed to every subscriber as a view of its buffer, which stays valid
+    for ``buffers - 1`` more traces; keep a copy to hold it longer.
+    """
+
+    def __init__(self, trace_len=4096, axes=1, sample_rate=25600, buffers=2, clock=time.monotonic, settle=0):
+        self.trace_len = int(trace_len)
+        self.axes = max(int(axes), 1)
+        self.sample_rate = sample_rate
+        self.size = self.trace_len * self.axes  # values per trace
+        self.clock = clock
+        self.settle = int(settle)
+        self._buffers = [np.zeros(self.size, dtype=np.float32) for _ in range(max(buffers, 1))]
+        self.subscribers = []  # callbacks; see subscribe()
+        self._lock = threading.Lock()
+        self.index = None     # trace being filled
+        self.filled = 0       # values of the current trace that arrived
+        self.completed = 0    # traces emitted complete
+        self.incomplete = 0   # traces emitted with missing values, or skipped by a gap
+        self.last = None      # most recent Trace
+        self._t_start = None
+        self._end = 0         # offset just past the last value written to the current trace
+        self._lost = False    # the current trace holds values that were placed before a loss was found
+        self._started = None  # index of the last trace started
+        self._held = deque()  # values waiting to settle: [first_index, values (a copy), t_first]
+        self._placed = 0      # stream index just after the last value written to a trace
+        self._suspect = []    # (start, stop) stream index ranges whose values may be misplaced
+        self.shifts = []      # (start, stop, count) per shift(), as located by the timebase
+        self._rate = 0.0      # download rate over the last full window, values per second
+        self._window = None   # (host time, values) at the start of the current rate window
+        self._received = 0    # values fed since the stream started
+
+    @classmethod
+    def from_params(cls, params, **kwargs):
+        """Build from raw register values (as read from the sensor): trace_len, axes and sample_rate."""
+        return cls(trace_len=mapped("trace_len", params.get("trace_len"), 4096),
+                   axes=mapped("axes", params.get("axes"), 1),
+                   sample_rate=mapped("sample_rate", params.get("sample_rate"), 25600), **kwargs)
+
+    def subscribe(self, callback):
+        """``callback(trace)`` runs for every emitted trace, on the thread that feeds the assembler."""
+        with self._lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def _buffer(self, index):
+        return self._buffers[index % len(self._buffers)]
+
+    def feed(self, values, first_index, t_first=None):
+        """Add decoded ``values`` that start at stream index ``first_index`` (host time ``t_first``)."""
+        self._measure(len(values), self.clock())
+        if not self.settle:
+            self._place(first_index, values, t_first)
+            return
+        held = self._held
+        held.append([first_index, np.array(values, dtype=np.float32), t_first])  # the caller may reuse values
+        end = first_index + len(values)
+        while held and held[0][0] + len(held[0][1]) + self.settle <= end:
+            self._place(*held.popleft())
+
+    def _place(self, first_index, values, t_first):
+        position = first_index
+        end = first_index + len(values)
+        while position < end:
+            index, offset = divmod(position, self.size)
+            if index != self.index:
+                if self.index is not None:
+                    self._finish()  # the stream moved past the current trace: it ends here
+                if self._started is not None and index > self._started + 1:
+                    self.incomplete += index - self._started - 1  # not a single value arrived
+                self._start(index, first_index, t_first)
+            buffer = self._buffer(index)
+            if offset > self._end:
+                buffer[self._end:offset] = 0  # gap inside the trace
+            count = min(end - position, self.size - offset)
+            start = position - first_index
+            buffer[offset:offset + count] = values[start:start + count]
+            self.filled += count
+            self._end = offset + count
+            position += count
+            if offset + count == self.size:
+                self._finish()
+        self._placed = max(self._placed, end)
+
+    def shift(self, start, stop, count):
+        """``count`` values were lost somewhere between stream indices ``start`` and ``stop`` (found late).
+
+        Values fed from ``stop`` on belong ``count`` later and are moved; the traces
+        covering ``start`` up to the moved values are incomplete, as are any values
+        already in a trace (those cannot move any more).
+        """
+        self.shifts.append((start, stop, count))
+        self._suspect.append((start, max(stop, self._placed) + count))
+        dt = count / (self.sample_rate * self.axes)
+        moved = deque()
+        for first_index, values, t_first in self._held:
+            cut = min(max(stop - first_index, 0), len(values))
+            if cut:
+                moved.append([first_index, values[:cut], t_first])
+            if cut < len(values):
+                t = None if t_first is None else t_first + dt + cut / (self.sample_rate * self.axes)
+                moved.append([first_index + cut + count, values[cut:], t])
+        self._held = moved
+
+    def _start(self, index, first_index, t_first):
+        # Joined mid-trace or after a gap: the missing start is zeroed on the first write
+        self.index = index
+        self._started = index
+        self.filled = 0
+        self._end = 0
+        self._lost = False
+        self._t_start = None
+        if t_first is not None:
+            self._t_start = t_first + (index * self.size - first_index) / (self.sample_rate * self.axes)
+
+    def _finish(self):
+        first, last = self.index * self.size, (self.index + 1) * self.size
+        self._suspect = [(start, stop) for start, stop in self._suspect if stop > first]
+        if any(start < last for start, _ in self._suspect):
+            self._lost = True
+        if self.filled < self.size:
+            self._buffer(self.index)[self._end:] = 0  # clear what the previous use of this buffer left
+        self._emit(self.index, self.filled, self._t_start, self._lost)
+        self.index = None
+        self.filled = 0
+
+    def _emit(self, index, filled, t_start, lost):
+        complete = filled == self.size and not lost
+        trace = Trace(index, self._buffer(index).reshape(self.trace_len, self.axes), filled, complete,
+                      t_start, self.sample_rate, self.axes)
+        if complete:
+            self.completed += 1
+        else:
+            self.incomplete += 1
+        self.last = trace
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(trace)
+            except Exception as e:
+                print(f"Trace subscriber failed: {e}")
+
+    def _measure(self, count, arrival, window=1.0):
+        # Notifications come in bursts per connection interval: measure over whole seconds
+        if self._window is None:
+            self._window = (arrival, self._received)
+        elif arrival - self._window[0] >= window:
+            self._rate = (self._received - self._window[1]) / (arrival - self._window[0])
+            self._window = (arrival, self._received)
+        self._received += count
+
+    def flush(self):
+        """Place the held-back values and emit the trace being filled (stream stopped); it is incomplete unless full."""
+        while self._held:
+            self._place(*self._held.popleft())
+        if self.index is not None:
+            self._finish()
+
+    @property
+    def progress(self):
+        """Fraction of the current trace received."""
+        return self.filled / self.size if self.index is not None else 0.0
+
+    @property
+    def throughput(self):
+        """Download rate in samples (frames) per second."""
+        return self._rate / self.axes
+
+    @property
+    def eta(self):
+        """Seconds until the current trace is complete at the present rate, or None."""
+        if self._rate <= 0:
+            return None
+        return (self.size - self.filled) / self._rate
+
+    def status(self):
+        """One line for the device window."""
+        text = f"Trace {self.trace_len} x {self.axes}: {self.progress:.0%}, {self.throughput / 1000:.1f} kS/s"
+        eta = self.eta
+        if eta is not None and self.index is not None:
+            text += f", {eta:.1f} s left"
+        text += f" | {self.completed} complete, {self.incomplete} incomplete"
+        return text
@@ -0,0 +1,56 @@
+"""BLE transport selection.
+
+Code that talks to sensors uses ``transport.BleakClient`` / ``transport.BleakScanner``
+instead of importing bleak directly, so a different backend can be swapped in:
+
+    BLUVIB_BACKEND=sim python scanner3.py
+
+Backends: "bleak" (real radio, default), "sim" (utils/sim_backend.py) and
+"replay" (utils/replay_backend.py, recordings named in $BLUVIB_REPLAY).
+"""
+import os
+
+BleakClient = None
+BleakScanner = None
+backend_name = None
+
+_BACKENDS = {}  # name -> loader returning (scanner_cls, client_cls)
+
+
+def register_backend(name, loader):
+    """Register a backend; ``loader()`` is only called when the backend is selected."""
+    _BACKENDS[name] = loader
+
+
+def use_backend(name):
+    """Select the backend every later ``transport.BleakClient(...)`` call will use."""
+    global BleakClient, BleakScanner, backend_name
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown BLE backend {name!r}, choose from {sorted(_BACKENDS)}")
+    BleakScanner, BleakClient = _BACKENDS[name]()
+    backend_name = name
+    print(f"BLE backend: {name}")
+
+
+def _load_bleak():
+    from bleak import BleakClient, BleakScanner
+    return BleakScanner, BleakClient
+
+
+def _load_sim():
+    from .sim_backend import SimScanner, SimClient
+    return SimScanner, SimClient
+
+
+def _load_replay():
+    from .replay_backend import ReplayClient, load_from_env
+    from .sim_backend import SimScanner
+    load_from_env()
+    return SimScanner, ReplayClient
+
+
+register_backend("bleak", _load_bleak)
+register_backend("sim", _load_sim)
+register_backend("replay", _load_replay)
+
+use_backend(os.environ.get("BLUVIB_BACKEND", "bleak"))